@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+import threading
+
+from menus.menu_pool import menu_pool
+
+# the invalidations collected by delay_invalidation(), per thread
+_delayed = threading.local()
+
+
+def delay(clear, values=None):
+    """
+    Collects an invalidation made in a delay_invalidation() block. When the
+    block is left, clear is called once: without arguments, or with the set
+    of all the values collected for it if values are given.
+
+    Returns False outside of such a block, the caller has to invalidate right
+    away then.
+    """
+    invalidations = getattr(_delayed, 'invalidations', None)
+    if invalidations is None:
+        return False
+    if values is None:
+        invalidations[clear] = None
+    else:
+        invalidations.setdefault(clear, set()).update(values)
+    return True
+
+
+@contextmanager
+def delay_invalidation():
+    """
+    Coalesces the invalidations of the CMS caches and the menus made in the
+    block, so bulk operations (like publishing or copying many pages) do each
+    of them only once, when the block is left. Nested blocks are part of the
+    outermost one.
+
+    As the invalidations happen when the block is left, it should enclose the
+    transaction of the changes, so they are committed by then.
+    """
+    if getattr(_delayed, 'invalidations', None) is not None:
+        yield
+        return
+    _delayed.invalidations = {}
+    try:
+        with menu_pool.delay_clear():
+            yield
+    finally:
+        invalidations, _delayed.invalidations = _delayed.invalidations, None
+        for clear, values in invalidations.items():
+            if values is None:
+                clear()
+            else:
+                clear(values)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import time
+
+from cms.cache import delay
+from cms.utils import get_cms_setting
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def get_cache_key(site_id, path, preview, draft):
+    return "%s:page:%s:%s:%d%d" % (
+        get_cms_setting('CACHE_PREFIX'), site_id,
+        hashlib.md5(path.encode('utf-8')).hexdigest(), preview, draft)
+
+def get_cache_version_key():
+    return "%s:page:version" % (get_cms_setting('CACHE_PREFIX'),)
+
+def get_cache_version():
+    version = cache.get(get_cache_version_key())
+    if version is None:
+        # time based, so a version which got evicted from the cache does not
+        # start again with a value it already had
+        version = int(time.time() * 1000)
+        cache.set(get_cache_version_key(), version,
+                get_cms_setting('CACHE_DURATIONS')['menus'])
+    return version
+
+
+def get_page_cache(site_id, path, preview, draft):
+    """
+    Helper for reading a resolved page from cache
+    """
+    return cache.get(get_cache_key(site_id, path, preview, draft),
+                     version=get_cache_version())
+
+
+def set_page_cache(site_id, path, preview, draft, page):
+    """
+    Helper for storing a resolved page in cache. The entry never outlives the
+    publication end date of the page.
+    """
+    duration = get_cms_setting('CACHE_DURATIONS')['menus']
+    if page.publication_end_date and get_cms_setting('SHOW_END_DATE'):
+        remaining = page.publication_end_date - timezone.now()
+        duration = min(duration, int(remaining.days * 86400 + remaining.seconds))
+        if duration <= 0:
+            return
+    cache.set(get_cache_key(site_id, path, preview, draft), page, duration,
+              version=get_cache_version())
+
+
+def clear_page_cache():
+    if delay(clear_page_cache):
+        return
+    try:
+        cache.incr(get_cache_version_key())
+    except ValueError:
+        get_cache_version()
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from cms.cache import delay
 from cms.utils import get_cms_setting
 from django.conf import settings
 from django.core.cache import cache
@@ -49,11 +50,19 @@ def clear_user_permission_cache(user):
     """
     Cleans permission cache for given user.
     """
-    for key in PERMISSION_KEYS:
-        cache.delete(get_cache_key(user, key), version=get_cache_version())
+    if delay(_clear_users_permission_cache, [user]):
+        return
+    _clear_users_permission_cache([user])
+
+
+def _clear_users_permission_cache(users):
+    cache.delete_many([get_cache_key(user, key) for user in users for key in PERMISSION_KEYS],
+                      version=get_cache_version())
 
 
 def clear_permission_cache():
+    if delay(clear_permission_cache):
+        return
     version = get_cache_version()
     if version > 1:
         cache.incr(get_cache_version_key())
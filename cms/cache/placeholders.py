@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import time
+
+from cms.cache import delay
+from cms.utils import get_cms_setting
+from django.core.cache import cache
+
+
+def get_cache_version_key(page_id):
+    return "%s:placeholder:version:%s" % (get_cms_setting('CACHE_PREFIX'), page_id)
+
+def get_cache_key(page, slot, lang, site_id, extra):
+    # slots are free form, they may contain characters memcached rejects
+    return "%s:placeholder:%s:%s:%s:%s:%s" % (
+        get_cms_setting('CACHE_PREFIX'), page.pk,
+        hashlib.md5(slot.encode('utf-8')).hexdigest(), lang, site_id,
+        "_".join(map(str, extra)))
+
+def get_cache_version(page):
+    version_key = get_cache_version_key(page.pk)
+    version = cache.get(version_key)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.set(version_key, version, get_cms_setting('CACHE_DURATIONS')['content'])
+    return version
+
+
+def get_placeholder_cache(page, slot, lang, site_id, extra=()):
+    """
+    Helper for reading the rendered output of a placeholder of a (public)
+    page from cache
+    """
+    return cache.get(get_cache_key(page, slot, lang, site_id, extra),
+                     version=get_cache_version(page))
+
+
+def set_placeholder_cache(page, slot, lang, site_id, value, extra=()):
+    """
+    Helper for storing the rendered output of a placeholder of a (public)
+    page in cache.
+    """
+    cache.set(get_cache_key(page, slot, lang, site_id, extra), value,
+              get_cms_setting('CACHE_DURATIONS')['content'],
+              version=get_cache_version(page))
+
+
+def clear_placeholder_cache(page_ids):
+    """
+    Invalidates the cached placeholders of the given pages.
+    """
+    if delay(clear_placeholder_cache, page_ids):
+        return
+    version_keys = [get_cache_version_key(page_id) for page_id in page_ids]
+    versions = cache.get_many(version_keys)
+    # time based, so a version which got evicted from the cache does not
+    # start again with a value it already had
+    now = int(time.time() * 1000)
+    cache.set_many(
+        dict((key, max(now, versions.get(key, 0) + 1)) for key in version_keys),
+        get_cms_setting('CACHE_DURATIONS')['content'])
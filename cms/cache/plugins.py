@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import time
+
+from cms.cache import delay
+from cms.utils import get_cms_setting
+from django.core.cache import cache
+
+
+def get_cache_key(plugin, vary_on):
+    vary_on = hashlib.md5(repr(vary_on)).hexdigest()
+    return "%s:plugin:%s:%s:%s" % (
+        get_cms_setting('CACHE_PREFIX'), plugin.pk,
+        plugin.changed_date.strftime('%Y%m%d%H%M%S%f'), vary_on)
+
+def get_cache_version_key():
+    return "%s:plugin:version" % (get_cms_setting('CACHE_PREFIX'),)
+
+def get_cache_version():
+    version = cache.get(get_cache_version_key())
+    if version is None:
+        # time based, so a version which got evicted from the cache does not
+        # start again with a value it already had
+        version = int(time.time() * 1000)
+        cache.set(get_cache_version_key(), version,
+                get_cms_setting('CACHE_DURATIONS')['content'])
+    return version
+
+
+def get_plugin_cache(plugin, vary_on):
+    """
+    Helper for reading the rendered output of a plugin from cache
+    """
+    return cache.get(get_cache_key(plugin, vary_on), version=get_cache_version())
+
+
+def set_plugin_cache(plugin, vary_on, value, timeout=None):
+    """
+    Helper for storing the rendered output of a plugin in cache.
+    """
+    if timeout is None:
+        timeout = get_cms_setting('CACHE_DURATIONS')['content']
+    cache.set(get_cache_key(plugin, vary_on), value, timeout,
+              version=get_cache_version())
+
+
+def clear_plugin_cache():
+    if delay(clear_plugin_cache):
+        return
+    try:
+        cache.incr(get_cache_version_key())
+    except ValueError:
+        get_cache_version()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import time
+
+from cms.cache import delay
+from cms.utils import get_cms_setting
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_cache_key, learn_cache_key
+
+
+def get_key_prefix(site_id):
+    return "%s:response:%s" % (get_cms_setting('CACHE_PREFIX'), site_id)
+
+def get_cache_version_key():
+    return "%s:response:version" % (get_cms_setting('CACHE_PREFIX'),)
+
+def get_global_version():
+    version = cache.get(get_cache_version_key())
+    if version is None:
+        # time based, so a version which got evicted from the cache does not
+        # start again with a value it already had
+        version = int(time.time() * 1000)
+        cache.set(get_cache_version_key(), version,
+                get_cms_setting('CACHE_DURATIONS')['content'])
+    return version
+
+def get_cache_version(site_id, language):
+    """
+    Responses also show the menus of their site and language, which are
+    invalidated whenever pages change, so the menu versions are part of the
+    version of a cached response.
+    """
+    from menus.menu_pool import menu_pool
+
+    versions = [get_global_version()] + menu_pool._get_versions(site_id, language)
+    return "_".join(map(str, versions))
+
+
+def get_response_cache(request, site_id, language):
+    """
+    Helper for reading the response to a GET request from cache. Like with
+    Django's cache middleware, the key includes the values of the request
+    headers listed in the Vary header of the cached response.
+    """
+    key = get_cache_key(request, get_key_prefix(site_id), 'GET', cache=cache)
+    if key is None:
+        return None
+    return cache.get(key, version=get_cache_version(site_id, language))
+
+
+def set_response_cache(request, site_id, language, page, response):
+    """
+    Helper for storing the response to a GET request in cache. The entry never
+    outlives the publication end date of the page.
+    """
+    duration = get_cms_setting('CACHE_DURATIONS')['content']
+    if page.publication_end_date and get_cms_setting('SHOW_END_DATE'):
+        remaining = page.publication_end_date - timezone.now()
+        duration = min(duration, int(remaining.days * 86400 + remaining.seconds))
+        if duration <= 0:
+            return
+    key = learn_cache_key(request, response, duration, get_key_prefix(site_id),
+                          cache=cache)
+    cache.set(key, response, duration,
+              version=get_cache_version(site_id, language))
+
+
+def clear_response_cache():
+    if delay(clear_response_cache):
+        return
+    try:
+        cache.incr(get_cache_version_key())
+    except ValueError:
+        get_global_version()
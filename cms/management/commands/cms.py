@@ -7,6 +7,7 @@ from cms.management.commands.subcommands.moderator import ModeratorCommand
 from cms.management.commands.subcommands.uninstall import UninstallCommand
 from cms.management.commands.subcommands.mptt import FixMPTTCommand
 from cms.management.commands.subcommands.delete_orphaned_plugins import DeleteOrphanedPluginsCommand
+from cms.management.commands.subcommands.publish import PublishCommand
 from django.core.management.base import BaseCommand
 from optparse import make_option
 
@@ -16,6 +17,12 @@ class Command(SubcommandsCommand):
     option_list = BaseCommand.option_list + (
         make_option('--noinput', action='store_false', dest='interactive', default=True,
         help='Tells django-cms to NOT prompt the user for input of any kind. '),
+        make_option('--site', dest='site', default=None,
+        help='publish: Only publishes the pages of the site with this id.'),
+        make_option('--since', dest='since', default=None,
+        help='publish: Only publishes the pages changed since this date (YYYY-MM-DD [HH:MM[:SS]]).'),
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+        help='publish: Lists the pages which would be published, without publishing them.'),
     )
 
     args = '<subcommand>'
@@ -29,6 +36,7 @@ class Command(SubcommandsCommand):
         'fix-mptt': FixMPTTCommand,
         'delete_orphaned_plugins': DeleteOrphanedPluginsCommand,
         'check': CheckInstallation,
+        'publish': PublishCommand,
     }
 
     @property
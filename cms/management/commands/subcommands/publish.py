@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import time
+
+from cms.cache import delay_invalidation
+from cms.models import Page
+from cms.utils.permissions import set_current_user
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+import datetime
+
+
+class PublishCommand(BaseCommand):
+    args = '[<page id or reverse id> ...]'
+    help = ('Publishes the published drafts of the given subtrees (or of all '
+            'pages), parents first')
+
+    def handle(self, *args, **options):
+        # thread locals middleware needs to know, who are we - login as a first
+        # super user
+        try:
+            user = User.objects.filter(is_active=True, is_staff=True, is_superuser=True)[0]
+        except IndexError:
+            raise CommandError("No super user found, create one using `manage.py createsuperuser`.")
+        set_current_user(user)
+
+        pages = Page.objects.drafts().filter(published=True)
+        if options.get('site'):
+            pages = pages.filter(site=options['site'])
+        if args:
+            subtrees = Q()
+            for root in self.get_roots(args):
+                subtrees |= Q(tree_id=root.tree_id, lft__gte=root.lft, rght__lte=root.rght)
+            pages = pages.filter(subtrees)
+        if options.get('since'):
+            pages = pages.filter(changed_date__gte=self.parse_since(options['since']))
+        # parents first, the pages can only be published once their parent is
+        pages = pages.order_by('tree_id', 'lft')
+
+        if options.get('dry_run'):
+            for page in pages:
+                self.stdout.write(u"%s [%d]\n" % (page, page.pk))
+            return
+
+        started = time.time()
+        pages_total = pages_published = 0
+        # the caches and menus are only invalidated once for the whole run
+        with delay_invalidation():
+            for pk, public_id in list(pages.values_list('pk', 'publisher_public_id')):
+                pages_total += 1
+                # publishing a page changes the pages below it (their tree
+                # fields and, for the ones waiting for it, their public
+                # version), so each page is loaded right before publishing it
+                page = Page.objects.get(pk=pk)
+                # pages waiting for their parent got published along with it
+                published = public_id is None and page.publisher_public_id
+                if published or page.publish():
+                    pages_published += 1
+                    self.stdout.write(u"%s [%d]\n" % (page, page.pk))
+        seconds = time.time() - started
+        self.stdout.write(u"Published %d of %d pages in %.1f seconds (%.1f pages/s)\n" % (
+            pages_published, pages_total, seconds, pages_total / seconds if seconds else 0))
+
+    def get_roots(self, args):
+        roots = []
+        for arg in args:
+            lookup = Q(reverse_id=arg)
+            if arg.isdigit():
+                lookup |= Q(pk=arg)
+            try:
+                roots.append(Page.objects.drafts().get(lookup))
+            except Page.DoesNotExist:
+                raise CommandError("No page found with the id or reverse id %r" % arg)
+            except Page.MultipleObjectsReturned:
+                raise CommandError("More than one page found with the id or reverse id %r" % arg)
+        return roots
+
+    def parse_since(self, value):
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError("Invalid date %r, use YYYY-MM-DD [HH:MM[:SS]]" % value)
+            since = datetime.datetime.combine(date, datetime.time())
+        if settings.USE_TZ and timezone.is_naive(since):
+            since = timezone.make_aware(since, timezone.get_current_timezone())
+        return since
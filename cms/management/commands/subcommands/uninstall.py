@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from cms.cache.pages import clear_page_cache
 from cms.management.commands.subcommands.base import SubcommandsCommand
 from cms.models.pluginmodel import CMSPlugin
 from cms.models.titlemodels import Title
@@ -25,6 +26,7 @@ Type 'yes' to continue, or 'no' to cancel: """ % (number_of_apphooks, label))
                 confirm = 'yes'
             if confirm == 'yes':
                 queryset.update(application_urls=None)
+                clear_page_cache()
                 self.stdout.write('%d %r apphooks uninstalled\n' % (number_of_apphooks, label))
         else:
             self.stdout.write('no %r apphooks found\n' % label)
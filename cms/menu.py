@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
 from cms.apphook_pool import apphook_pool
 from cms.models.permissionmodels import (ACCESS_DESCENDANTS,
     ACCESS_PAGE_AND_DESCENDANTS, ACCESS_CHILDREN, ACCESS_PAGE_AND_CHILDREN, ACCESS_PAGE)
+from cms.models.pagemodel import Page
 from cms.models.permissionmodels import PagePermission, GlobalPagePermission
 from cms.models.titlemodels import Title
 from cms.utils import get_language_from_request
@@ -15,10 +17,65 @@ from menus.base import Menu, NavigationNode, Modifier
 from menus.menu_pool import menu_pool
 
 from django.contrib.sites.models import Site
+from django.core.urlresolvers import reverse
 from django.db.models.query_utils import Q
 from django.utils.translation import get_language
 
 
+def get_view_restrictions(site=None):
+    """
+    Collects the view restrictions set on the pages (of the given site).
+
+    Returns a dict mapping the ids of every page affected by a view
+    restriction (both the draft and the public version) to the list of
+    (user_id, group_id) tuples which are granted to see it.
+
+    All the grants are loaded in one query. Grants on children or descendants
+    are expanded in memory against the (tree_id, lft, rght) intervals of the
+    pages, which are loaded in one more query if needed at all.
+    """
+    restricted_pages = defaultdict(list)
+    page_permissions = PagePermission.objects.filter(can_view=True)
+    if site:
+        page_permissions = page_permissions.filter(page__site=site)
+    page_permissions = list(page_permissions.values_list(
+        'user', 'group', 'grant_on', 'page', 'page__publisher_public',
+        'page__tree_id', 'page__lft', 'page__rght', 'page__level'))
+
+    # leaf pages have neither children nor descendants
+    tree_ids = set(perm[5] for perm in page_permissions
+                   if perm[2] != ACCESS_PAGE and perm[7] - perm[6] > 1)
+    trees = defaultdict(list)
+    if tree_ids:
+        tree_pages = Page.objects.filter(tree_id__in=tree_ids).order_by('tree_id', 'lft').values_list(
+            'lft', 'level', 'id', 'publisher_public', 'tree_id')
+        for lft, level, id, public_id, tree_id in tree_pages:
+            trees[tree_id].append((lft, level, id, public_id))
+    tree_lfts = dict((tree_id, [page[0] for page in pages]) for tree_id, pages in trees.items())
+
+    for user_id, group_id, grant_on, page_id, public_id, tree_id, lft, rght, level in page_permissions:
+        grant = (user_id, group_id)
+        affected = []
+        # add the page with the perm itself
+        if grant_on in [ACCESS_PAGE, ACCESS_PAGE_AND_CHILDREN, ACCESS_PAGE_AND_DESCENDANTS]:
+            affected.append((page_id, public_id))
+        if grant_on != ACCESS_PAGE and tree_id in trees:
+            # the descendants are the pages of the tree with lft in ]lft, rght[
+            lfts = tree_lfts[tree_id]
+            descendants = trees[tree_id][bisect_right(lfts, lft):bisect_left(lfts, rght)]
+            # add children
+            if grant_on in [ACCESS_CHILDREN, ACCESS_PAGE_AND_CHILDREN]:
+                affected.extend((page[2], page[3]) for page in descendants if page[1] == level + 1)
+            # add descendants
+            elif grant_on in [ACCESS_DESCENDANTS, ACCESS_PAGE_AND_DESCENDANTS]:
+                affected.extend((page[2], page[3]) for page in descendants)
+        for id, public_id in affected:
+            for pk in (id, public_id):
+                if pk is not None and grant not in restricted_pages[pk]:
+                    restricted_pages[pk].append(grant)
+    return dict(restricted_pages)
+
+
 def get_visible_pages(request, pages, site=None):
     """
      This code is basically a many-pages-at-once version of
@@ -27,45 +84,27 @@ def get_visible_pages(request, pages, site=None):
      check if there is ANY restriction
      that needs a permission page visibility calculation
     """
+    restricted_pages = get_view_restrictions(site)
+    return get_visible_page_ids(request, [page.pk for page in pages], restricted_pages, site)
+
+
+def get_visible_page_ids(request, page_ids, restricted_pages, site=None):
+    """
+    Returns the subset of page_ids visible to the user of the request, given
+    the restrictions index built by get_view_restrictions.
+    """
     public_for = get_cms_setting('PUBLIC_FOR')
     is_setting_public_all = public_for == 'all'
     is_setting_public_staff = public_for == 'staff'
     is_auth_user = request.user.is_authenticated()
     visible_page_ids = []
-    restricted_pages = defaultdict(list)
-    page_permissions = PagePermission.objects.filter(can_view=True).select_related('page', 'group__users')
-
-    for perm in page_permissions:
-
-        # collect the pages that are affected by permissions
-        if site and perm.page.site_id != site.pk:
-            continue
-        if perm is not None and perm not in restricted_pages[perm.page.pk]:
-            # affective restricted pages gathering
-            # using mptt functions 
-            # add the page with the perm itself
-            if perm.grant_on in [ACCESS_PAGE, ACCESS_PAGE_AND_CHILDREN, ACCESS_PAGE_AND_DESCENDANTS]:
-                restricted_pages[perm.page.pk].append(perm)
-                restricted_pages[perm.page.publisher_public_id].append(perm)
-                # add children
-            if perm.grant_on in [ACCESS_CHILDREN, ACCESS_PAGE_AND_CHILDREN]:
-                child_ids = perm.page.get_children().values_list('id', 'publisher_public_id')
-                for id, public_id in child_ids:
-                    restricted_pages[id].append(perm)
-                    restricted_pages[public_id].append(perm)
-            # add descendants
-            elif perm.grant_on in [ACCESS_DESCENDANTS, ACCESS_PAGE_AND_DESCENDANTS]:
-                child_ids = perm.page.get_descendants().values_list('id', 'publisher_public_id')
-                for id, public_id in child_ids:
-                    restricted_pages[id].append(perm)
-                    restricted_pages[public_id].append(perm)
 
     # anonymous
     # no restriction applied at all
     if (not is_auth_user and
         is_setting_public_all and
         not restricted_pages):
-        return [page.pk for page in pages]
+        return list(page_ids)
 
     if site is None:
         site = current_site(request)
@@ -82,7 +121,7 @@ def get_visible_pages(request, pages, site=None):
                 is_setting_public_staff and request.user.is_staff)) and
             not restricted_pages and
             not global_view_perms):
-            return [page.pk for page in pages]
+            return list(page_ids)
         #no page perms edge case - none visible
         elif (is_setting_public_staff and
             not request.user.is_staff and
@@ -98,29 +137,32 @@ def get_visible_pages(request, pages, site=None):
 
     has_global_perm.cache = -1
 
-    def has_permission_membership(page):
+    def get_group_ids():
+        # the group memberships are resolved once per call
+        if get_group_ids.cache is None:
+            get_group_ids.cache = set(request.user.groups.values_list('pk', flat=True))
+        return get_group_ids.cache
+
+    get_group_ids.cache = None
+
+    def has_permission_membership(page_id):
         """
         PagePermission user group membership tests
         """
         user_pk = request.user.pk
-        page_pk = page.pk
-        has_perm = False
-        for perm in restricted_pages[page_pk]:
-            if perm.user_id == user_pk:
-                has_perm = True
-            if not perm.group_id:
-                continue
-            group_user_ids = perm.group.user_set.values_list('pk', flat=True)
-            if user_pk in group_user_ids:
-                has_perm = True
-        return has_perm
-
-    for page in pages:
+        for user_id, group_id in restricted_pages[page_id]:
+            if user_id == user_pk:
+                return True
+            if group_id and group_id in get_group_ids():
+                return True
+        return False
+
+    for page_id in page_ids:
         to_add = False
         # default to false, showing a restricted page is bad
         # explicitly check all the conditions
         # of settings and permissions
-        is_restricted = page.pk in restricted_pages
+        is_restricted = page_id in restricted_pages
         # restricted_pages contains as key any page.pk that is
         # affected by a permission grant_on
         if is_auth_user:
@@ -137,7 +179,7 @@ def get_visible_pages(request, pages, site=None):
                 # authenticated staff user, no restriction and public for staff
                 to_add = True
             # check group and user memberships to restricted pages
-            elif is_restricted and has_permission_membership(page):
+            elif is_restricted and has_permission_membership(page_id):
                 to_add = True
             elif has_global_perm():
                 to_add = True
@@ -146,7 +188,7 @@ def get_visible_pages(request, pages, site=None):
             to_add = True
             # store it
         if to_add:
-            visible_page_ids.append(page.pk)
+            visible_page_ids.append(page_id)
     return visible_page_ids
 
 
@@ -169,6 +211,9 @@ def page_to_node(page, home, cut):
     # Should we cut the Node from its parents?
     if home and page.parent_id == home.pk and cut:
         parent_id = None
+        # kept for the ViewRestrictionFilter, which may have to attach the
+        # node again when the home page is hidden
+        attr['cut_parent_id'] = page.parent_id
 
     # possible fix for a possible problem
     #if parent_id and not page.parent.get_calculated_status():
@@ -243,12 +288,20 @@ class CMSMenu(Menu):
         home = None
         actual_pages = []
 
-        # cache view perms
-        visible_pages = get_visible_pages(request, pages, site)
+        if get_cms_setting('SHARED_MENU_CACHE'):
+            # The nodes are shared between all users: instead of filtering the
+            # pages here, the view restrictions are stored on the nodes and
+            # applied per request by the ViewRestrictionFilter modifier.
+            restricted_pages = get_view_restrictions(site)
+            visible_pages = None
+        else:
+            # cache view perms
+            restricted_pages = {}
+            visible_pages = set(get_visible_pages(request, pages, site))
         for page in pages:
             # Pages are ordered by tree_id, therefore the first page is the root
             # of the page tree (a.k.a "home")
-            if page.pk not in visible_pages:
+            if visible_pages is not None and page.pk not in visible_pages:
                 # Don't include pages the user doesn't have access to
                 continue
             if not home:
@@ -275,13 +328,95 @@ class CMSMenu(Menu):
 
         for page in actual_pages:
             if page.title_cache:
-                nodes.append(page_to_node(page, home, home_cut))
+                node = page_to_node(page, home, home_cut)
+                if page.pk in restricted_pages:
+                    node.attr['view_restrictions'] = restricted_pages[page.pk]
+                nodes.append(node)
         return nodes
 
 
 menu_pool.register_menu(CMSMenu)
 
 
+class ViewRestrictionFilter(Modifier):
+    """
+    Removes the pages the current user is not allowed to see (and their
+    descendants) from a menu tree shared between all users.
+
+    Only active if CMS_SHARED_MENU_CACHE is set.
+    """
+    def modify(self, request, nodes, namespace, root_id, post_cut, breadcrumb):
+        if post_cut or not get_cms_setting('SHARED_MENU_CACHE'):
+            return nodes
+        page_ids = []
+        restricted_pages = {}
+        home = None
+        for node in nodes:
+            if node.namespace == CMSMenu.__name__:
+                page_ids.append(node.id)
+                if 'view_restrictions' in node.attr:
+                    restricted_pages[node.id] = node.attr['view_restrictions']
+                if home is None and node.attr.get('is_home', False):
+                    home = node
+        visible_pages = set(get_visible_page_ids(
+            request, page_ids, restricted_pages, Site.objects.get_current()))
+        if home is not None and home.id not in visible_pages:
+            return self.rebuild(request, nodes, visible_pages)
+        hidden = set()
+        for node in nodes:
+            if (node.namespace == CMSMenu.__name__ and
+                    node.id not in visible_pages and node not in hidden):
+                hidden.add(node)
+                hidden.update(node.get_descendants())
+                if node.parent:
+                    node.parent.children.remove(node)
+        if not hidden:
+            return nodes
+        nodes = [node for node in nodes if node not in hidden]
+        if [node for node in hidden if getattr(node, 'selected', False)]:
+            # the selected page is hidden, select the closest visible one
+            nodes = menu_pool._mark_selected(request, nodes)
+        return nodes
+
+    def rebuild(self, request, nodes, visible_pages):
+        """
+        Rebuilds the page tree for a user who is not allowed to see the home
+        page, the way CMSMenu.get_nodes builds it for the user alone: the
+        first visible page becomes the home page, the children of the home
+        page are cut from it if it isn't in the navigation, and the pages
+        whose parent is hidden are left out.
+        """
+        cms_nodes = [node for node in nodes if node.namespace == CMSMenu.__name__
+                     and node.id in visible_pages]
+        if not cms_nodes:
+            return [node for node in nodes if node.namespace != CMSMenu.__name__]
+        home = cms_nodes[0]
+        home_cut = not home.visible and len(cms_nodes) > 1
+        kept = {}
+        for node in cms_nodes:
+            node.attr.pop('is_home', None)
+            parent_id = node.attr.pop('cut_parent_id', node.parent_id)
+            if home_cut and parent_id == home.id:
+                parent_id = None
+            if parent_id is not None and parent_id not in kept:
+                continue
+            node.parent_id = parent_id
+            node.parent = kept.get(parent_id)
+            node.children = [child for child in node.children
+                             if child.namespace != CMSMenu.__name__]
+            if node.parent:
+                node.parent.children.append(node)
+            kept[node.id] = node
+        home.attr['is_home'] = True
+        home.url = reverse('pages-root')
+        nodes = [node for node in nodes if node.namespace != CMSMenu.__name__
+                 or node.id in kept]
+        return menu_pool._mark_selected(request, nodes)
+
+
+menu_pool.register_modifier(ViewRestrictionFilter)
+
+
 class NavExtender(Modifier):
     def modify(self, request, nodes, namespace, root_id, post_cut, breadcrumb):
         if post_cut:
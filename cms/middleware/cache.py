@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Full page cache middlewares for anonymous visitors.
+
+Like Django's cache middlewares, they come in two parts:
+UpdatePageCacheMiddleware has to be first in MIDDLEWARE_CLASSES, so it sees
+the responses with the cookies and Vary headers set by all the other
+middlewares, and FetchFromPageCacheMiddleware has to be last, after the
+middlewares which activate the language and set up the user.
+"""
+from cms.cache.responses import get_response_cache, set_response_cache
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.translation import get_language
+
+
+class UpdatePageCacheMiddleware(object):
+    """
+    Stores the responses of public CMS pages which were rendered for anonymous
+    visitors in the cache, unless they are specific to the visitor: responses
+    setting cookies, using the CSRF token, changing the session or showing
+    messages are never cached.
+    """
+
+    def is_cacheable_response(self, request, response):
+        if response.status_code != 200 or getattr(response, 'streaming', False):
+            return False
+        if response.cookies or request.META.get('CSRF_COOKIE_USED'):
+            return False
+        if 'private' in response.get('Cache-Control', ''):
+            return False
+        session = getattr(request, 'session', None)
+        if session is not None and session.modified:
+            return False
+        messages = get_messages(request)
+        if getattr(messages, 'used', False) and len(messages):
+            return False
+        return True
+
+    def process_response(self, request, response):
+        language = getattr(request, '_cms_update_page_cache', None)
+        if language is None:
+            return response
+        # set by the details view when it rendered the page itself
+        page = getattr(request, '_cms_rendered_page', None)
+        if (page is None or page.publisher_is_draft or page.login_required
+                or not self.is_cacheable_response(request, response)):
+            return response
+        set_response_cache(request, settings.SITE_ID, language, page, response)
+        return response
+
+
+class FetchFromPageCacheMiddleware(object):
+    """
+    Serves public CMS pages to anonymous visitors from the cache. Cached
+    responses are dropped when a page gets published, the menus of their site
+    or language are invalidated, or view permissions change.
+    """
+
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD') or request.GET:
+            return False
+        user = getattr(request, 'user', None)
+        return user is not None and not user.is_authenticated()
+
+    def process_request(self, request):
+        if not self.is_cacheable_request(request):
+            return None
+        # the language is deactivated again by the time the response gets
+        # stored
+        language = get_language()
+        response = get_response_cache(request, settings.SITE_ID, language)
+        if response is None and request.method == 'GET':
+            request._cms_update_page_cache = language
+        return response
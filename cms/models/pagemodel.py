@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
 from datetime import timedelta
 
 from cms import constants
+from cms.cache import delay_invalidation
 from cms.utils.conf import get_cms_setting
 from django.core.exceptions import PermissionDenied
 from cms.exceptions import NoHomeFound, PublicIsUnmodifiable
@@ -11,11 +13,12 @@ from cms.models.placeholdermodel import Placeholder
 from cms.models.pluginmodel import CMSPlugin
 from cms.publisher.errors import MpttPublisherCantPublish
 from cms.utils import i18n, page as page_utils
-from cms.utils.copy_plugins import copy_plugins_to
+from cms.utils.copy_plugins import copy_plugins_to, copy_plugin_lists, update_plugins_in
 from cms.utils.helpers import reversion_register
+from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -134,69 +137,85 @@ class Page(MPTTModel):
         check_title_slugs, overwrite_url on the moved page don't need any check
         as it remains the same regardless of the page position in the tree
         """
-        # do not mark the page as dirty after page moves
-        self._publisher_keep_state = True
+        with delay_invalidation():
+            # do not mark the page as dirty after page moves
+            self._publisher_keep_state = True
 
-        # make sure move_page does not break when using INHERIT template
-        # and moving to a top level position
+            # make sure move_page does not break when using INHERIT template
+            # and moving to a top level position
 
-        if (position in ('left', 'right')
-        and not target.parent
-        and self.template == constants.TEMPLATE_INHERITANCE_MAGIC):
-            self.template = self.get_template()
-        self.move_to(target, position)
+            if (position in ('left', 'right')
+            and not target.parent
+            and self.template == constants.TEMPLATE_INHERITANCE_MAGIC):
+                self.template = self.get_template()
+            self.move_to(target, position)
 
-        # fire signal
-        import cms.signals as cms_signals
+            # fire signal
+            import cms.signals as cms_signals
 
-        cms_signals.page_moved.send(sender=Page, instance=self)
-        self.save()  # always save the page after move, because of publisher
-        # check the slugs
-        page_utils.check_title_slugs(self)
+            cms_signals.page_moved.send(sender=Page, instance=self)
+            self.save()  # always save the page after move, because of publisher
+            # check the slugs
+            page_utils.check_title_slugs(self)
 
-        if self.publisher_public_id:
-            # Ensure we have up to date mptt properties
-            public_page = Page.objects.get(pk=self.publisher_public_id)
-            # Ensure that the page is in the right position and save it
-            public_page = self._publisher_save_public(public_page)
-            cms_signals.page_moved.send(sender=Page, instance=public_page)
-            public_page.save()
-            page_utils.check_title_slugs(public_page)
+            if self.publisher_public_id:
+                # Ensure we have up to date mptt properties
+                public_page = Page.objects.get(pk=self.publisher_public_id)
+                # Ensure that the page is in the right position and save it
+                public_page = self._publisher_save_public(public_page)
+                cms_signals.page_moved.send(sender=Page, instance=public_page)
+                public_page.save()
+                page_utils.check_title_slugs(public_page)
 
     def _copy_titles(self, target):
         """
         Copy all the titles to a new page (which must have a pk).
         :param target: The page where the new titles should be stored
         """
-        old_titles = dict(target.title_set.values_list('language', 'pk'))
+        from titlemodels import Title
+
+        fields = [field.attname for field in Title._meta.fields
+                  if field.attname not in ('id', 'page_id')]
+        old_titles = dict((title.language, title) for title in target.title_set.all())
         for title in self.title_set.all():
             # If an old title exists, overwrite. Otherwise create new
-            title.pk = old_titles.pop(title.language, None)
+            old_title = old_titles.pop(title.language, None)
+            if old_title and all(getattr(title, field) == getattr(old_title, field) for field in fields):
+                continue
+            title.pk = old_title.pk if old_title else None
             title.page = target
             title.save()
         if old_titles:
-            from titlemodels import Title
-
-            Title.objects.filter(id__in=old_titles.values()).delete()
+            Title.objects.filter(id__in=[title.pk for title in old_titles.values()]).delete()
 
-    def _copy_contents(self, target):
+    def _copy_contents(self, target, only_changed=False):
         """
         Copy all the plugins to a new page.
         :param target: The page where the new content should be stored
+        :param only_changed: Only update the plugins which changed since they
+            were copied to the target (when publishing).
         """
-        # TODO: Make this into a "graceful" copy instead of deleting and overwriting
         # copy the placeholders (and plugins on those placeholders!)
-        CMSPlugin.objects.filter(placeholder__page=target).delete()
-        for ph in self.placeholders.all():
+        placeholders = list(self.placeholders.all())
+        target_placeholders = dict((ph.slot, ph) for ph in target.placeholders.all())
+        if only_changed:
+            slots = set(ph.slot for ph in placeholders)
+            CMSPlugin.objects.filter(placeholder__in=[
+                ph for slot, ph in target_placeholders.items() if slot not in slots]).delete()
+        else:
+            CMSPlugin.objects.filter(placeholder__page=target).delete()
+        for ph in placeholders:
             plugins = ph.get_plugins_list()
-            try:
-                ph = target.placeholders.get(slot=ph.slot)
-            except Placeholder.DoesNotExist:
+            if ph.slot in target_placeholders:
+                ph = target_placeholders[ph.slot]
+            else:
                 ph.pk = None  # make a new instance
                 ph.save()
                 target.placeholders.add(ph)
                 # update the page copy
-            if plugins:
+            if only_changed:
+                update_plugins_in(plugins, ph)
+            elif plugins:
                 copy_plugins_to(plugins, ph)
 
     def _copy_attributes(self, target):
@@ -228,108 +247,168 @@ class Page(MPTTModel):
 
         Note for issue #1166: when copying pages there is no need to check for
         conflicting URLs as pages are copied unpublished.
-        """
-        from cms.utils.moderator import update_moderation_message
-
-        page_copy = None
-
-        pages = [self] + list(self.get_descendants().order_by('-rght'))
 
-        site_reverse_ids = Page.objects.filter(site=site, reverse_id__isnull=False).values_list('reverse_id', flat=True)
-
-        if target:
-            target.old_pk = -1
-            if position == "first-child":
-                tree = [target]
-            elif target.parent_id:
-                tree = [target.parent]
-            else:
-                tree = []
-        else:
-            tree = []
-        if tree:
-            tree[0].old_pk = tree[0].pk
+        :returns: The copy of the page.
+        """
+        with delay_invalidation():
+            return self._copy_page(target, site, position, copy_permissions)
 
-        first = True
-        # loop over all affected pages (self is included in descendants)
+    def _copy_page(self, target, site, position, copy_permissions):
+        from cms.cache.pages import clear_page_cache
+        from cms.cache.permissions import clear_permission_cache
+        from cms.cache.responses import clear_response_cache
+        from cms.models.moderatormodels import PageModeratorState
+        from cms.models.permissionmodels import PagePermission
+        from cms.models.titlemodels import Title
+        from cms.signals import application_post_changed
+
+        # parents come before their children
+        pages = list(self.get_descendants(include_self=True).order_by('lft'))
+        page_ids = [page.pk for page in pages]
+        titles = defaultdict(list)
+        for title in Title.objects.filter(page__in=page_ids):
+            titles[title.page_id].append(title)
+        placeholders = defaultdict(list)
+        for link in Page.placeholders.through.objects.filter(
+                page__in=page_ids).select_related('placeholder'):
+            placeholders[link.page_id].append(link.placeholder)
+        plugins = defaultdict(list)
+        for plugin in CMSPlugin.objects.filter(
+                placeholder__page__in=page_ids).order_by('tree_id', 'lft'):
+            plugins[plugin.placeholder_id].append(plugin)
+
+        site_reverse_ids = set(Page.objects.filter(site=site, reverse_id__isnull=False).values_list('reverse_id', flat=True))
+
+        origin_lft, origin_level = pages[0].lft, pages[0].level
+        copies = {}
+        copied = []
         for page in pages:
-            titles = list(page.title_set.all())
-            # get all current placeholders (->plugins)
-            placeholders = list(page.placeholders.all())
-            origin_id = page.id
             # create a copy of this page by setting pk = None (=new instance)
-            page.old_pk = page.pk
+            old_pk = page.pk
             page.pk = None
-            page.level = None
-            page.rght = None
-            page.lft = None
-            page.tree_id = None
             page.published = False
             page.publisher_public_id = None
+            page.site = site
             # only set reverse_id on standard copy
             if page.reverse_id in site_reverse_ids:
                 page.reverse_id = None
-            if first:
-                first = False
-                if tree:
-                    page.parent = tree[0]
-                else:
-                    page.parent = None
+            if not copied:
+                page.parent = None
+                page.level = None
+                page.rght = None
+                page.lft = None
+                page.tree_id = None
                 page.insert_at(target, position)
+                page.save()
+                root = page
+                # make room for all the descendants at once, they are
+                # inserted with their tree fields already set
+                size = 2 * (len(pages) - 1)
+                if size:
+                    Page._tree_manager._create_space(size, root.lft, root.tree_id)
+                    root.rght += size
             else:
-                count = 1
-                found = False
-                for prnt in tree:
-                    if prnt.old_pk == page.parent_id:
-                        page.parent = prnt
-                        tree = tree[0:count]
-                        found = True
-                        break
-                    count += 1
-                if not found:
-                    page.parent = None
-            tree.append(page)
-            page.site = site
-
-            page.save()
-
-            # copy permissions if necessary
-            if get_cms_setting('PERMISSION') and copy_permissions:
-                from cms.models.permissionmodels import PagePermission
-
-                for permission in PagePermission.objects.filter(page__id=origin_id):
-                    permission.pk = None
-                    permission.page = page
-                    permission.save()
-
-            update_moderation_message(page, unicode(_('Page was copied.')))
-
-            # copy titles of this page
-            for title in titles:
+                page.parent = copies[page.parent_id]
+                page.lft += root.lft - origin_lft
+                page.rght += root.lft - origin_lft
+                page.level += root.level - origin_level
+                page.tree_id = root.tree_id
+                page.save()
+            copies[old_pk] = page
+            copied.append((old_pk, page))
+
+        # copy the titles, with slugs which don't clash with the ones of their
+        # new siblings. Only the copied page has siblings which aren't copies
+        # as well (and the children of a new home page).
+        root_is_home = root.is_home()
+        paths = defaultdict(dict)
+        if root.parent_id:
+            paths[root.parent_id] = dict(Title.objects.filter(
+                page=root.parent_id).values_list('language', 'path'))
+        taken = {}
+        new_titles = []
+        for old_pk, page in copied:
+            parent_paths = paths[page.parent_id]
+            for title in titles[old_pk]:
                 title.pk = None  # setting pk = None creates a new instance
                 title.page = page
-
+                key = (page.parent_id, settings.USE_I18N and title.language)
+                if key not in taken:
+                    if page is root or (page.parent_id == root.pk and root_is_home):
+                        taken[key] = page_utils.get_taken_slugs(page, page.parent, title.language, site)
+                    else:
+                        taken[key] = (set(), set())
+                taken_slugs, taken_paths = taken[key]
+                parent_path = None
+                for language in [title.language] + i18n.get_fallback_languages(title.language):
+                    if language in parent_paths:
+                        parent_path = parent_paths[language]
+                        break
+                overwrite = title.has_url_overwrite and title.path
                 # create slug-copy for standard copy
-                title.slug = page_utils.get_available_slug(title)
-                title.save()
+                while True:
+                    if page is root and root_is_home:
+                        path = ''
+                    elif overwrite:
+                        path = title.path.strip(" /")
+                    elif parent_path is not None:
+                        path = (u'%s/%s' % (parent_path, title.slug)).lstrip("/")
+                    else:
+                        path = title.slug
+                    if title.slug not in taken_slugs and (
+                            overwrite or not path or path not in taken_paths):
+                        break
+                    title.slug = page_utils.get_copy_slug(title.slug)
+                title.path = path
+                taken_slugs.add(title.slug)
+                taken_paths.add(path)
+                paths[page.pk][title.language] = path
+                new_titles.append(title)
+        Title.objects.bulk_create(new_titles)
+        clear_page_cache()
+        for title in new_titles:
+            if title.application_urls:
+                application_post_changed.send(sender=Title, instance=title)
+
+        # copy permissions if necessary
+        if get_cms_setting('PERMISSION') and copy_permissions:
+            permissions = list(PagePermission.objects.filter(page__in=page_ids))
+            for permission in permissions:
+                permission.pk = None
+                permission.page = copies[permission.page_id]
+            if permissions:
+                PagePermission.objects.bulk_create(permissions)
+                clear_permission_cache()
+                clear_response_cache()
+
+        PageModeratorState.objects.filter(page__in=[page.pk for old_pk, page in copied]).update(
+            message=unicode(_('Page was copied.')))
 
-            # copy the placeholders (and plugins on those placeholders!)
-            for ph in placeholders:
-                plugins = ph.get_plugins_list()
-                try:
-                    ph = page.placeholders.get(slot=ph.slot)
-                except Placeholder.DoesNotExist:
+        # copy the placeholders (and plugins on those placeholders!)
+        page_placeholders = defaultdict(dict)
+        for link in Page.placeholders.through.objects.filter(
+                page__in=[page.pk for old_pk, page in copied]).select_related('placeholder'):
+            page_placeholders[link.page_id][link.placeholder.slot] = link.placeholder
+        new_links = []
+        plugin_copies = []
+        for old_pk, page in copied:
+            for ph in placeholders[old_pk]:
+                ph_plugins = plugins[ph.pk]
+                if ph.slot in page_placeholders[page.pk]:
+                    ph = page_placeholders[page.pk][ph.slot]
+                else:
+                    # saved one by one, bulk_create doesn't give their ids
                     ph.pk = None  # make a new instance
                     ph.save()
-                    page.placeholders.add(ph)
-                    # update the page copy
-                    page_copy = page
-                if plugins:
-                    copy_plugins_to(plugins, ph)
+                    new_links.append(Page.placeholders.through(page=page, placeholder=ph))
+                if ph_plugins:
+                    plugin_copies.append((ph_plugins, ph))
+        Page.placeholders.through.objects.bulk_create(new_links)
+        copy_plugin_lists(plugin_copies)
 
         # invalidate the menu for this site
         menu_pool.clear(site_id=site.pk)
-        return page_copy  # return the page_copy or None
+        return root
 
     def save(self, no_signals=False, commit=True, **kwargs):
         """
@@ -390,6 +469,15 @@ class Page(MPTTModel):
 
         :returns: True if page was successfully published.
         """
+        # publish all or nothing, in the transaction of the caller if there
+        # is one (like in the admin) or else in a transaction of its own
+        with delay_invalidation():
+            if transaction.is_managed():
+                return self._publish()
+            with transaction.commit_on_success():
+                return self._publish()
+
+    def _publish(self):
         # Publish can only be called on draft pages
         if not self.publisher_is_draft:
             raise PublicIsUnmodifiable('The public instance cannot be published. Use draft.')
@@ -420,7 +508,7 @@ class Page(MPTTModel):
 
             # The target page now has a pk, so can be used as a target
             self._copy_titles(public_page)
-            self._copy_contents(public_page)
+            self._copy_contents(public_page, only_changed=True)
 
             # invalidate the menu for this site
             menu_pool.clear(site_id=self.site_id)
@@ -493,25 +581,26 @@ class Page(MPTTModel):
         if not self.publisher_is_draft:
             raise PublicIsUnmodifiable('The public instance cannot be unpublished. Use draft.')
 
-        # First, make sure we are in the correct state
-        self.published = False
-        self.save()
-        public_page = self.get_public_object()
-        if public_page:
-            public_page.published = False
-            public_page.save()
-
-            # Go through all children of our public instance
-            descendants = public_page.get_descendants()
-            for child in descendants:
-                child.published = False
-                child.save()
-                draft = child.publisher_public
-                if (draft and draft.published and
-                        draft.publisher_state == Page.PUBLISHER_STATE_DEFAULT):
-                    draft.publisher_state = Page.PUBLISHER_STATE_PENDING
-                    draft._publisher_keep_state = True
-                    draft.save()
+        with delay_invalidation():
+            # First, make sure we are in the correct state
+            self.published = False
+            self.save()
+            public_page = self.get_public_object()
+            if public_page:
+                public_page.published = False
+                public_page.save()
+
+                # Go through all children of our public instance
+                descendants = public_page.get_descendants()
+                for child in descendants:
+                    child.published = False
+                    child.save()
+                    draft = child.publisher_public
+                    if (draft and draft.published and
+                            draft.publisher_state == Page.PUBLISHER_STATE_DEFAULT):
+                        draft.publisher_state = Page.PUBLISHER_STATE_PENDING
+                        draft._publisher_keep_state = True
+                        draft.save()
 
         return True
 
@@ -964,7 +1053,10 @@ class Page(MPTTModel):
         """Returns smart queryset depending on object type - draft / public
         """
         qs = self.__class__.objects
-        return self.publisher_is_draft and qs.drafts() or qs.public().published()
+        # no and/or here, it would evaluate the (whole) queryset of drafts
+        if self.publisher_is_draft:
+            return qs.drafts()
+        return qs.public().published()
 
     def _publisher_can_publish(self):
         """Is parent of this object already published?
@@ -221,7 +221,7 @@ class CMSPlugin(MPTTModel):
         if no_signals:  # ugly hack because of mptt
             super(CMSPlugin, self).save_base(cls=self.__class__)
         else:
-            super(CMSPlugin, self).save()
+            super(CMSPlugin, self).save(*args, **kwargs)
 
     def set_base_attr(self, plugin):
         for attr in ['parent_id', 'placeholder', 'language', 'plugin_type', 'creation_date', 'level', 'lft', 'rght', 'position', 'tree_id']:
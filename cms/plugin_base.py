@@ -105,6 +105,15 @@ class CMSPluginBase(admin.ModelAdmin):
     allow_children = False
     child_classes = None
 
+    # Render cache policy: if render_cache is True, the rendered output of the
+    # instances of this plugin is cached for render_cache_timeout seconds (or
+    # the 'content' cache duration), separately for each value of what is
+    # listed in render_cache_vary_on: 'language', 'site', 'user' or keys of
+    # request.META.
+    render_cache = False
+    render_cache_timeout = None
+    render_cache_vary_on = ('language', 'site')
+
     opts = {}
     module = None #track in which module/application belongs
 
@@ -125,6 +134,21 @@ class CMSPluginBase(admin.ModelAdmin):
         context['placeholder'] = placeholder
         return context
 
+    def pre_render(self, request, instances):
+        """
+        Called with all instances of this plugin which are about to be
+        rendered together (e.g. the plugins of a page), so the objects they
+        need for rendering can be loaded for all of them at once.
+        """
+        pass
+
+    def is_cacheable(self, instance):
+        """
+        Whether the rendered output of instance may be served from the render
+        cache.
+        """
+        return self.render_cache
+
     @property
     def parent(self):
         return self.cms_plugin_instance.parent
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from cms.cache.plugins import get_plugin_cache, set_plugin_cache
 from cms.models.placeholdermodel import Placeholder
 from cms.plugin_processors import (plugin_meta_context_processor,
     mark_safe_plugin_processor)
@@ -10,7 +11,10 @@ from django.conf import settings
 from django.template import Template, Context
 from django.template.defaultfilters import title
 from django.template.loader import render_to_string
-from django.utils.translation import ugettext_lazy as _
+from django.test.signals import setting_changed
+from django.utils.safestring import mark_safe
+from django.utils.translation import ugettext_lazy as _, get_language
+from sekizai.helpers import Watcher, get_varname
 
 # these are always called before all other plugin context processors
 DEFAULT_PLUGIN_CONTEXT_PROCESSORS = (
@@ -23,6 +27,30 @@ DEFAULT_PLUGIN_PROCESSORS = (
 )
 
 
+# the processors configured in the settings, imported on first use
+_standard_processors = {}
+
+
+def get_processors(setting_name):
+    """
+    Returns the processors listed in the given (CMS_ prefixed) setting,
+    importing them only the first time they are asked for.
+    """
+    if setting_name not in _standard_processors:
+        _standard_processors[setting_name] = tuple(iterload_objects(get_cms_setting(setting_name)))
+    return _standard_processors[setting_name]
+
+
+def clear_standard_processors(**kwargs):
+    """
+    Forgets the imported processors. Called whenever a setting is changed
+    through override_settings or SettingsOverride.
+    """
+    _standard_processors.clear()
+
+setting_changed.connect(clear_standard_processors)
+
+
 class PluginContext(Context):
     """
     This subclass of template.Context automatically populates itself using
@@ -32,14 +60,16 @@ class PluginContext(Context):
     """
     def __init__(self, dict, instance, placeholder, processors=None, current_app=None):
         super(PluginContext, self).__init__(dict, current_app=current_app)
-        if not processors:
-            processors = []
+        # push the output of all processors as a single dict
+        processed = {}
         for processor in DEFAULT_PLUGIN_CONTEXT_PROCESSORS:
-            self.update(processor(instance, placeholder))
-        for processor in iterload_objects(get_cms_setting('PLUGIN_CONTEXT_PROCESSORS')):
-            self.update(processor(instance, placeholder))
-        for processor in processors:
-            self.update(processor(instance, placeholder))
+            processed.update(processor(instance, placeholder))
+        for processor in get_processors('PLUGIN_CONTEXT_PROCESSORS'):
+            processed.update(processor(instance, placeholder))
+        if processors:
+            for processor in processors:
+                processed.update(processor(instance, placeholder))
+        self.update(processed)
 
 def render_plugin(context, instance, placeholder, template, processors=None,
                   current_app=None):
@@ -47,22 +77,74 @@ def render_plugin(context, instance, placeholder, template, processors=None,
     Renders a single plugin and applies the post processors to it's rendered
     content.
     """
-    if not processors:
-        processors = []
     if isinstance(template, basestring):
         content = render_to_string(template, context_instance=context)
     elif isinstance(template, Template):
         content = template.render(context)
     else:
         content = ''
-    for processor in iterload_objects(get_cms_setting('PLUGIN_PROCESSORS')):
-        content = processor(instance, placeholder, content, context)
-    for processor in processors:
+    for processor in get_processors('PLUGIN_PROCESSORS'):
         content = processor(instance, placeholder, content, context)
+    if processors:
+        for processor in processors:
+            content = processor(instance, placeholder, content, context)
     for processor in DEFAULT_PLUGIN_PROCESSORS:
         content = processor(instance, placeholder, content, context)
     return content
 
+def restore_sekizai(context, changes):
+    """
+    Replays sekizai data captured by a sekizai.helpers.Watcher.
+    """
+    if not changes:
+        return
+    sekizai_container = context[get_varname()]
+    for key, values in changes.items():
+        sekizai_namespace = sekizai_container[key]
+        for value in values:
+            sekizai_namespace.append(value)
+
+def _get_cache_vary_on(plugin_class, plugin, request):
+    vary_on = [plugin._render_meta.index, plugin._render_meta.total]
+    # plugins rendering their children (like text) are rendered anew when one
+    # of them is added, changed or removed
+    vary_on.extend((child.pk, child.changed_date) for child in
+                   getattr(plugin, 'child_plugin_instances', None) or ())
+    for name in plugin_class.render_cache_vary_on:
+        if name == 'language':
+            vary_on.append(get_language())
+        elif name == 'site':
+            vary_on.append(settings.SITE_ID)
+        elif name == 'user':
+            vary_on.append(request.user.pk if request.user.is_authenticated() else None)
+        else:
+            vary_on.append(request.META.get(name))
+    return vary_on
+
+def render_cached_plugin(plugin, context, placeholder, processors=None):
+    """
+    Renders a plugin, serving its output from the render cache if the cache
+    policy of its plugin class allows it.
+    """
+    request = context.get('request')
+    if (processors or request is None or
+            getattr(getattr(request, 'toolbar', None), 'edit_mode', False)):
+        return plugin.render_plugin(context, placeholder, processors=processors)
+    plugin_class = plugin.get_plugin_class()
+    if not plugin_class().is_cacheable(plugin):
+        return plugin.render_plugin(context, placeholder)
+    vary_on = _get_cache_vary_on(plugin_class, plugin, request)
+    cached_value = get_plugin_cache(plugin, vary_on)
+    if cached_value is not None:
+        restore_sekizai(context, cached_value['sekizai'])
+        return mark_safe(cached_value['content'])
+    watcher = Watcher(context)
+    content = plugin.render_plugin(context, placeholder)
+    set_plugin_cache(plugin, vary_on,
+                     {'content': content, 'sekizai': watcher.get_changes()},
+                     plugin_class.render_cache_timeout)
+    return content
+
 def render_plugins(plugins, context, placeholder, processors=None):
     """
     Renders a collection of plugins with the given context, using the appropriate processors
@@ -78,7 +160,7 @@ def render_plugins(plugins, context, placeholder, processors=None):
         plugin._render_meta.total = total
         plugin._render_meta.index = index
         context.push()
-        out.append(plugin.render_plugin(context, placeholder, processors=processors))
+        out.append(render_cached_plugin(plugin, context, placeholder, processors))
         context.pop()
     return out
 
@@ -3,6 +3,7 @@ from django.contrib.sites.models import Site
 from django.conf import settings
 from cms.plugin_pool import plugin_pool
 from cms.plugin_base import CMSPluginBase
+from cms.plugins.utils import prefetch_page_links
 from cms.plugins.link.forms import LinkForm
 from models import Link
 
@@ -11,8 +12,12 @@ class LinkPlugin(CMSPluginBase):
     form = LinkForm
     name = _("Link")
     render_template = "cms/plugins/link.html"
+    render_cache = True
     text_enabled = True
     
+    def pre_render(self, request, instances):
+        prefetch_page_links(instances)
+
     def render(self, context, instance, placeholder):
         if instance.mailto:
             link = u"mailto:%s" % instance.mailto
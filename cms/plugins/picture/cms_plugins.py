@@ -1,5 +1,6 @@
 from cms.plugin_pool import plugin_pool
 from cms.plugin_base import CMSPluginBase
+from cms.plugins.utils import prefetch_page_links
 from django.utils.translation import ugettext_lazy as _
 from cms.plugins.picture.models import Picture
 from django.conf import settings
@@ -8,8 +9,12 @@ class PicturePlugin(CMSPluginBase):
     model = Picture
     name = _("Picture")
     render_template = "cms/plugins/picture.html"
+    render_cache = True
     text_enabled = True
 
+    def pre_render(self, request, instances):
+        prefetch_page_links(instances)
+
     def render(self, context, instance, placeholder):
         if instance.url:
             link = instance.url
@@ -1,5 +1,6 @@
 from cms.plugin_pool import plugin_pool
 from cms.plugin_base import CMSPluginBase
+from cms.plugins.utils import prefetch_page_links
 from django.utils.translation import ugettext_lazy as _
 from cms.plugins.teaser.models import Teaser
 
@@ -8,6 +9,9 @@ class TeaserPlugin(CMSPluginBase):
     name = _("Teaser")
     render_template = "cms/plugins/teaser.html"
     
+    def pre_render(self, request, instances):
+        prefetch_page_links(instances)
+
     def render(self, context, instance, placeholder):
         if instance.url:
             link = instance.url
@@ -1,3 +1,6 @@
+from collections import defaultdict
+
+from cms.models import CMSPlugin
 from cms.plugin_pool import plugin_pool
 from cms.plugin_base import CMSPluginBase
 from django.utils.translation import ugettext_lazy as _
@@ -5,6 +8,7 @@ from models import Text
 from cms.plugins.text.forms import TextForm
 from cms.plugins.text.widgets.wymeditor_widget import WYMEditor
 from cms.plugins.text.utils import plugin_tags_to_user_html
+from cms.plugins.utils import downcast_plugins, pre_render_plugins
 from django.forms.fields import CharField
 from cms.plugins.text.settings import USE_TINYMCE
 from django.conf import settings
@@ -15,6 +19,7 @@ class TextPlugin(CMSPluginBase):
     name = _("Text")
     form = TextForm
     render_template = "cms/plugins/text.html"
+    render_cache = True
     change_form_template = "cms/plugins/text_plugin_change_form.html"
 
     def get_editor_widget(self, request, plugins):
@@ -45,14 +50,48 @@ class TextPlugin(CMSPluginBase):
         kwargs['form'] = form # override standard form
         return super(TextPlugin, self).get_form(request, obj, **kwargs)
 
+    def get_child_plugins(self, context, instance):
+        """
+        Returns the plugins embedded in the text: the children attached by
+        build_plugin_tree, or else the children of all text plugins of the
+        placeholder, fetched once per request.
+        """
+        children = getattr(instance, 'child_plugin_instances', None)
+        if children is not None:
+            return children
+        request = context.get('request')
+        if request is None or not instance.placeholder_id:
+            return None
+        children_cache = request.__dict__.setdefault('_text_plugin_children_cache', {})
+        key = (instance.placeholder_id, instance.language)
+        if key not in children_cache:
+            children_cache[key] = defaultdict(list)
+            plugins = CMSPlugin.objects.filter(placeholder=instance.placeholder_id,
+                language=instance.language, parent__plugin_type=self.__class__.__name__)
+            plugins = downcast_plugins(plugins.order_by('tree_id', 'lft'), select_placeholder=True)
+            pre_render_plugins(request, plugins)
+            for plugin in plugins:
+                children_cache[key][plugin.parent_id].append(plugin)
+        return children_cache[key].get(instance.pk, [])
+
     def render(self, context, instance, placeholder):
         context.update({
-            'body': plugin_tags_to_user_html(instance.body, context, placeholder), 
+            'body': plugin_tags_to_user_html(instance.body, context, placeholder,
+                                             self.get_child_plugins(context, instance),
+                                             instance.get_body_segments()),
             'placeholder': placeholder,
             'object': instance
         })
         return context
     
+    def is_cacheable(self, instance):
+        # the embedded plugins are rendered along with the text, so they all
+        # have to be cacheable too
+        children = getattr(instance, 'child_plugin_instances', None)
+        if not self.render_cache or children is None:
+            return False
+        return all(child.get_plugin_class()().is_cacheable(child) for child in children)
+
     def save_model(self, request, obj, form, change):
         obj.clean_plugins()
         super(TextPlugin, self).save_model(request, obj, form, change)
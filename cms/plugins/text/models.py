@@ -1,6 +1,10 @@
+import itertools
+import threading
+
 from cms.models import CMSPlugin
 from cms.plugins.text.utils import (plugin_admin_html_to_tags, 
-    plugin_tags_to_admin_html, plugin_tags_to_id_list, replace_plugin_tags)
+    plugin_tags_to_admin_html, plugin_tags_to_id_list, replace_plugin_tags,
+    split_plugin_tags)
 from cms.utils.html import clean_html
 from django.db import models
 from django.utils.html import strip_tags
@@ -9,6 +13,33 @@ from django.utils.translation import ugettext_lazy as _
 
 _old_tree_cache = {}
 
+# the compiled bodies of the texts rendered by this process, by (pk,
+# changed_date), each as [last use, body, segments]. The least recently used
+# ones are dropped once the bodies add up to more than BODY_SEGMENTS_CACHE_SIZE
+# characters.
+_body_segments_cache = {}
+_body_segments_lock = threading.Lock()
+_body_segments_clock = itertools.count()
+_body_segments_size = [0]
+BODY_SEGMENTS_CACHE_SIZE = 8 * 1024 * 1024
+
+
+def _cache_body_segments(key, body, segments):
+    with _body_segments_lock:
+        if key in _body_segments_cache:
+            return
+        _body_segments_cache[key] = [next(_body_segments_clock), body, segments]
+        _body_segments_size[0] += len(body)
+        if _body_segments_size[0] <= BODY_SEGMENTS_CACHE_SIZE:
+            return
+        entries = sorted(_body_segments_cache.items(),
+                         key=lambda item: item[1][0])
+        for old_key, entry in entries:
+            if _body_segments_size[0] <= BODY_SEGMENTS_CACHE_SIZE:
+                break
+            del _body_segments_cache[old_key]
+            _body_segments_size[0] -= len(entry[1])
+
 class AbstractText(CMSPlugin):
     """Abstract Text Plugin Class"""
     body = models.TextField(_("body"))
@@ -37,6 +68,30 @@ class AbstractText(CMSPlugin):
     def clean(self):
         self.body = clean_html(self.body, full=False)
     
+    def get_body_segments(self):
+        """
+        Returns the body split around the plugin object 'tags' (see
+        split_plugin_tags). The result is shared by all the instances of the
+        same saved text rendered by this process, so it must not be modified.
+        """
+        body = self.body
+        memo = self.__dict__.get('_body_segments')
+        if memo is not None and memo[0] is body:
+            return memo[1]
+        key = (self.pk, self.changed_date)
+        entry = _body_segments_cache.get(key) if self.pk else None
+        # comparing the bodies is much cheaper than splitting them again and
+        # catches unsaved changes
+        if entry is not None and entry[1] == body:
+            entry[0] = next(_body_segments_clock)
+            segments = entry[2]
+        else:
+            segments = split_plugin_tags(body)
+            if self.pk:
+                _cache_body_segments(key, body, segments)
+        self._body_segments = (body, segments)
+        return segments
+
     def clean_plugins(self):
         ids = plugin_tags_to_id_list(self.body)
         plugins = CMSPlugin.objects.filter(parent=self)
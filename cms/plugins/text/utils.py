@@ -36,15 +36,32 @@ def plugin_tags_to_id_list(text, regex=OBJ_ADMIN_RE):
     ids = regex.findall(text)
     return [int(id) for id in ids if id.isdigit()]
 
-def plugin_tags_to_user_html(text, context, placeholder):
+def split_plugin_tags(text):
+    """
+    Split the text around its plugin object 'tags' into a list of literal html
+    chunks interleaved with the ids of the plugins (every odd item is an id).
+    """
+    segments = OBJ_ADMIN_RE.split(text)
+    segments[1::2] = [int(plugin_id) for plugin_id in segments[1::2]]
+    return segments
+
+def plugin_tags_to_user_html(text, context, placeholder, plugins=None, segments=None):
     """
     Convert plugin object 'tags' into the form for public site.
 
-    context is the template context to use, placeholder is the placeholder name
+    context is the template context to use, placeholder is the placeholder name,
+    plugins an optional list of already loaded plugins the tags may refer to
+    (only the others are fetched from the database), segments the text as
+    returned by split_plugin_tags if already at hand.
     """
-    plugin_map = _plugin_dict(text)
-    def _render_tag(m):
-        plugin_id = int(m.groups()[0])
+    if segments is None:
+        segments = split_plugin_tags(text)
+    plugin_map = dict((plugin.pk, plugin) for plugin in plugins or ())
+    missing_ids = [plugin_id for plugin_id in segments[1::2]
+                   if plugin_id not in plugin_map]
+    if missing_ids:
+        plugin_map.update(_plugin_dict_from_ids(missing_ids))
+    def _render_tag(plugin_id):
         try:
             obj = plugin_map[plugin_id]
             obj._render_meta.text_enabled = True
@@ -53,7 +70,9 @@ def plugin_tags_to_user_html(text, context, placeholder):
             # end user so just remove it from the HTML altogether
             return u''
         return obj.render_plugin(context, placeholder)
-    return OBJ_ADMIN_RE.sub(_render_tag, text)
+    output = segments[:]
+    output[1::2] = [_render_tag(plugin_id) for plugin_id in segments[1::2]]
+    return u''.join(output)
 
 
 def plugin_admin_html_to_tags(text):
@@ -83,6 +102,9 @@ def replace_plugin_tags(text, id_dict):
 
 
 def _plugin_dict(text, regex=OBJ_ADMIN_RE):
-    plugin_ids = plugin_tags_to_id_list(text, regex)
+    return _plugin_dict_from_ids(plugin_tags_to_id_list(text, regex))
+
+
+def _plugin_dict_from_ids(plugin_ids):
     plugin_list = downcast_plugins(CMSPlugin.objects.filter(pk__in=plugin_ids), select_placeholder=True)
     return dict((plugin.pk, plugin) for plugin in plugin_list)
\ No newline at end of file
@@ -5,12 +5,15 @@ from itertools import groupby
 from django.utils.translation import ugettext as _
 
 from cms.exceptions import PluginLimitReached
+from cms.models import CMSPlugin
 from cms.plugin_pool import plugin_pool
 from cms.utils import get_language_from_request
 from cms.utils.i18n import get_redirect_on_fallback, get_fallback_languages
 from cms.utils.moderator import get_cmsplugin_queryset
 from cms.utils.placeholder import get_placeholder_conf
 
+BASE_FIELDS = frozenset(CMSPlugin._meta.fields)
+
 
 def get_plugins(request, placeholder, lang=None):
     if not placeholder:
@@ -48,12 +51,72 @@ def assign_plugins(request, placeholders, lang=None):
     # split the plugins up by placeholder
     groups = dict((key, list(plugins)) for key, plugins in groupby(plugin_list, operator.attrgetter('placeholder_id')))
 
+    for placeholder in placeholders:
+        # spare the plugins (and the ones embedded in texts) a query for
+        # their placeholder when rendering
+        for plugin in groups.get(placeholder.pk, []):
+            plugin._placeholder_cache = placeholder
+    pre_render_plugins(request, plugin_list)
     for group in groups:
         groups[group] = build_plugin_tree(groups[group])
     for placeholder in placeholders:
         setattr(placeholder, '_%s_plugins_cache' % lang, list(groups.get(placeholder.pk, [])))
 
 
+def pre_render_plugins(request, plugins):
+    """
+    Calls the pre_render hook of the plugin classes with their instances
+    among ``plugins``.
+    """
+    plugin_types_map = defaultdict(list)
+    for plugin in plugins:
+        plugin_types_map[plugin.plugin_type].append(plugin)
+    for plugin_type, instances in plugin_types_map.iteritems():
+        plugin_pool.get_plugin(plugin_type)().pre_render(request, instances)
+
+
+def prefetch_page_links(instances, field_name='page_link'):
+    """
+    Loads the pages the given plugins link to through their ``field_name``
+    foreign key, along with the titles of the pages, so the urls of the links
+    can be rendered without further queries.
+    """
+    from cms.exceptions import NoHomeFound
+    from cms.models import Page, Title
+
+    if not instances:
+        return
+    field = instances[0]._meta.get_field(field_name)
+    instances = [instance for instance in instances
+                 if getattr(instance, field.attname, None) is not None
+                 and not hasattr(instance, field.get_cache_name())]
+    if not instances:
+        return
+    pages = Page.objects.in_bulk(set(getattr(instance, field.attname) for instance in instances))
+    for page in pages.values():
+        page.title_cache = {}
+    for title in Title.objects.filter(page__in=pages.keys()):
+        title._page_cache = pages[title.page_id]
+        title._page_cache.title_cache[title.language] = title
+    # get_absolute_url has to know whether root pages are the home page
+    homes = {}
+    for page in pages.values():
+        if page.parent_id:
+            continue
+        key = (page.publisher_is_draft, page.site_id)
+        if key not in homes:
+            try:
+                homes[key] = page.get_object_queryset().get_home(page.site_id).pk
+            except NoHomeFound:
+                homes[key] = None
+        if homes[key] is not None:
+            page.set_home_pk_cache(homes[key])
+    for instance in instances:
+        page = pages.get(getattr(instance, field.attname))
+        if page is not None:
+            setattr(instance, field.get_cache_name(), page)
+
+
 def build_plugin_tree(plugin_list):
     root = []
     cache = {}
@@ -73,25 +136,53 @@ def build_plugin_tree(plugin_list):
 
 
 def downcast_plugins(queryset, select_placeholder=False):
+    """
+    Returns the plugins of ``queryset`` cast down to their concrete plugin
+    models. The base rows are fetched once and only the columns of the plugin
+    models' own tables are loaded, with one query per plugin type.
+    """
+    if select_placeholder:
+        queryset = queryset.select_related('placeholder')
+    plugins = list(queryset)
     plugin_types_map = defaultdict(list)
     plugin_lookup = {}
 
     # make a map of plugin types, needed later for downcasting
-    for plugin in queryset:
-        plugin_types_map[plugin.plugin_type].append(plugin.pk)
-    for plugin_type, pks in plugin_types_map.iteritems():
-        cls = plugin_pool.get_plugin(plugin_type)
-        # get all the plugins of type cls.model
-        plugin_qs = cls.model.objects.filter(pk__in=pks)
-        if select_placeholder:
-            plugin_qs = plugin_qs.select_related('placeholder')
-
-        # put them in a map so we can replace the base CMSPlugins with their
-        # downcasted versions
-        for instance in plugin_qs:
+    for plugin in plugins:
+        plugin_types_map[plugin.plugin_type].append(plugin)
+    for plugin_type, base_plugins in plugin_types_map.iteritems():
+        model = plugin_pool.get_plugin(plugin_type).model
+        if model is CMSPlugin:
+            for plugin in base_plugins:
+                plugin_lookup[plugin.pk] = plugin
+            continue
+        # get the columns of the concrete model which are not on CMSPlugin
+        fields = model._meta.fields
+        extra_fields = [field.attname for field in fields if field not in BASE_FIELDS]
+        if extra_fields:
+            rows = model._base_manager.filter(
+                pk__in=[plugin.pk for plugin in base_plugins]
+            ).values_list('pk', *extra_fields)
+            rows = dict((row[0], dict(zip(extra_fields, row[1:]))) for row in rows)
+        else:
+            # proxy models share the table of CMSPlugin
+            rows = dict((plugin.pk, {}) for plugin in base_plugins)
+
+        # build the downcasted instances from the base rows and the extra
+        # columns and put them in a map so we can replace the base CMSPlugins
+        for plugin in base_plugins:
+            if plugin.pk not in rows:
+                continue
+            values = rows[plugin.pk]
+            instance = model(*[values[field.attname] if field.attname in values
+                               else getattr(plugin, field.attname) for field in fields])
+            for key, value in plugin.__dict__.iteritems():
+                instance.__dict__.setdefault(key, value)
+            instance._state.db = plugin._state.db
+            instance._state.adding = False
             plugin_lookup[instance.pk] = instance
-            # make the equivalent list of qs, but with downcasted instances
-    plugin_list = [plugin_lookup[p.pk] for p in queryset if p.pk in plugin_lookup]
+    # make the equivalent list of qs, but with downcasted instances
+    plugin_list = [plugin_lookup[p.pk] for p in plugins if p.pk in plugin_lookup]
     return plugin_list
 
 
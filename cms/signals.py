@@ -4,6 +4,10 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import signals
 from django.dispatch import Signal
 
+from cms.cache.pages import clear_page_cache
+from cms.cache.placeholders import clear_placeholder_cache
+from cms.cache.responses import clear_response_cache
+from cms.cache.plugins import clear_plugin_cache
 from cms.cache.permissions import clear_user_permission_cache, clear_permission_cache
 from cms.models import Page, Title, CMSPlugin, PagePermission, GlobalPagePermission, PageUser, PageUserGroup
 
@@ -44,6 +48,35 @@ def update_title_paths(instance, **kwargs):
 page_moved.connect(update_title_paths, sender=Page, dispatch_uid="cms.title.update_path")
 
 
+def invalidate_published_plugin_cache(instance, **kwargs):
+    clear_plugin_cache()
+
+
+post_publish.connect(invalidate_published_plugin_cache, sender=Page, dispatch_uid="cms.plugin.invalidate_published")
+
+
+def invalidate_placeholder_cache(instance, **kwargs):
+    """Invalidate the cached placeholders of the public version of the page
+    and of its descendants, which may inherit them.
+    """
+    public_ids = instance.get_descendants(include_self=True).filter(
+        publisher_is_draft=True).values_list('publisher_public', flat=True)
+    clear_placeholder_cache([page_id for page_id in public_ids if page_id])
+
+
+post_publish.connect(invalidate_placeholder_cache, sender=Page, dispatch_uid="cms.placeholder.invalidate_published")
+
+
+def invalidate_response_cache(instance, **kwargs):
+    clear_response_cache()
+
+
+post_publish.connect(invalidate_response_cache, sender=Page, dispatch_uid="cms.response.invalidate_published")
+signals.pre_save.connect(invalidate_response_cache, sender=PagePermission, dispatch_uid="cms.response.invalidate_permission")
+signals.pre_delete.connect(invalidate_response_cache, sender=PagePermission, dispatch_uid="cms.response.invalidate_permission")
+page_moved.connect(invalidate_placeholder_cache, sender=Page, dispatch_uid="cms.placeholder.invalidate_moved")
+
+
 def update_title(title):
     slug = u'%s' % title.slug
 
@@ -63,7 +96,9 @@ def update_title(title):
 def pre_save_title(instance, raw, **kwargs):
     """Save old state to instance and setup path
     """
+    clear_page_cache()
     if not instance.page.publisher_is_draft:
+        clear_plugin_cache()
         menu_pool.clear(instance.page.site_id)
     if instance.id and not hasattr(instance, "tmp_path"):
         instance.tmp_path = None
@@ -85,6 +120,7 @@ signals.pre_save.connect(pre_save_title, sender=Title, dispatch_uid="cms.title.p
 
 
 def post_save_title(instance, raw, created, **kwargs):
+    clear_page_cache()
     # Update descendants only if path changed
     application_changed = False
     prevent_descendants = hasattr(instance, 'tmp_prevent_descendant_update')
@@ -121,6 +157,15 @@ def post_save_title(instance, raw, created, **kwargs):
 signals.post_save.connect(post_save_title, sender=Title, dispatch_uid="cms.title.postsave")
 
 
+def pre_delete_title(instance, **kwargs):
+    clear_page_cache()
+    if not instance.page.publisher_is_draft:
+        clear_plugin_cache()
+
+
+signals.pre_delete.connect(pre_delete_title, sender=Title, dispatch_uid="cms.title.predelete")
+
+
 def post_save_user(instance, raw, created, **kwargs):
     """Signal called when new user is created, required only when CMS_PERMISSION.
     Assigns creator of the user to PageUserInfo model, so we know who had created
@@ -202,6 +247,10 @@ def update_placeholders(instance, **kwargs):
 def invalidate_menu_cache(instance, **kwargs):
     menu_pool.clear(instance.site_id)
 
+
+def invalidate_page_cache(instance, **kwargs):
+    clear_page_cache()
+
 # tell moderator, there is something happening with this page
 signals.pre_save.connect(pre_save_page, sender=Page, dispatch_uid="cms.page.presave")
 signals.post_save.connect(post_save_page_moderator, sender=Page, dispatch_uid="cms.page.postsave")
@@ -209,6 +258,9 @@ signals.post_save.connect(post_save_page, sender=Page)
 signals.post_save.connect(update_placeholders, sender=Page)
 signals.pre_save.connect(invalidate_menu_cache, sender=Page)
 signals.pre_delete.connect(invalidate_menu_cache, sender=Page)
+signals.pre_save.connect(invalidate_page_cache, sender=Page)
+signals.post_save.connect(invalidate_page_cache, sender=Page)
+signals.pre_delete.connect(invalidate_page_cache, sender=Page)
 
 
 def pre_save_user(instance, raw, **kwargs):
@@ -5,12 +5,14 @@ from classytags.arguments import Argument, MultiValueArgument
 from classytags.core import Options, Tag
 from classytags.helpers import InclusionTag, AsTag
 from classytags.parser import Parser
+from cms import constants
+from cms.cache.placeholders import get_placeholder_cache, set_placeholder_cache
 from cms.models import Page, Placeholder as PlaceholderModel
-from cms.plugin_rendering import render_placeholder
+from cms.plugin_rendering import render_placeholder, restore_sekizai
 from cms.plugins.utils import get_plugins, assign_plugins
 from cms.utils import get_language_from_request, get_cms_setting
 from cms.utils.page_resolver import get_page_queryset, use_draft
-from cms.utils.placeholder import validate_placeholder_name
+from cms.utils.placeholder import validate_placeholder_name, get_placeholder_conf
 from django import template
 from django.conf import settings
 from django.contrib.sites.models import Site
@@ -20,7 +22,7 @@ from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _, get_language
 import re
-from sekizai.helpers import Watcher, get_varname
+from sekizai.helpers import Watcher
 
 
 register = template.Library()
@@ -148,21 +150,47 @@ register.tag(PageUrl)
 register.tag('page_id_url', PageUrl)
 
 
-def _get_placeholder(current_page, page, context, name):
+def _fetch_placeholders(current_page, pages, context):
+    """
+    Loads the placeholders used by the templates of all given pages, and their
+    plugins, in one go into the placeholder cache of ``current_page``.
+    """
     from cms.utils.plugins import get_placeholders
 
     placeholder_cache = getattr(current_page, '_tmp_placeholders_cache', {})
-    if page.pk in placeholder_cache:
-        return placeholder_cache[page.pk].get(name, None)
-    placeholder_cache[page.pk] = {}
-    slots = get_placeholders(page.get_template())
-    placeholders = page.placeholders.filter(slot__in=slots)
+    pages = [page for page in pages if page.pk not in placeholder_cache]
+    if not pages:
+        return
+    # pages inheriting their template from a parent in the list can take it
+    # from there instead of querying their ancestors again
+    pages_by_pk = dict((page.pk, page) for page in pages)
+    for page in reversed(pages):
+        parent = pages_by_pk.get(page.parent_id)
+        if (parent is not None and page.template == constants.TEMPLATE_INHERITANCE_MAGIC
+                and not hasattr(page, '_template_cache')):
+            page._template_cache = parent.get_template()
+    slots = {}
+    for page in pages:
+        placeholder_cache[page.pk] = {}
+        slots[page.pk] = get_placeholders(page.get_template())
+    relations = Page.placeholders.through.objects.filter(
+        page__in=pages,
+        placeholder__slot__in=set(chain(*slots.values())),
+    ).select_related('placeholder')
+    placeholders = []
+    for relation in relations:
+        placeholder = relation.placeholder
+        if placeholder.slot in slots[relation.page_id]:
+            placeholder.page = pages_by_pk[relation.page_id]
+            placeholder_cache[relation.page_id][placeholder.slot] = placeholder
+            placeholders.append(placeholder)
     assign_plugins(context['request'], placeholders, get_language())
-    for placeholder in placeholders:
-        placeholder_cache[page.pk][placeholder.slot] = placeholder
-        placeholder.page = page
     current_page._tmp_placeholders_cache = placeholder_cache
-    return placeholder_cache[page.pk].get(name, None)
+
+
+def _get_placeholder(current_page, page, context, name):
+    _fetch_placeholders(current_page, [page], context)
+    return current_page._tmp_placeholders_cache[page.pk].get(name, None)
 
 
 def get_placeholder_content(context, request, current_page, name, inherit):
@@ -172,7 +200,8 @@ def get_placeholder_content(context, request, current_page, name, inherit):
     # mistakenly edit/delete them. This is a fix for issue #1303. See the discussion
     # there for possible enhancements
     if inherit and not edit_mode:
-        pages = chain([current_page], current_page.get_cached_ancestors(ascending=True))
+        pages = [current_page] + current_page.get_cached_ancestors(ascending=True)
+        _fetch_placeholders(current_page, pages, context)
     for page in pages:
         placeholder = _get_placeholder(current_page, page, context, name)
         if placeholder is None:
@@ -261,11 +290,38 @@ class Placeholder(Tag):
 
             return ''
 
-        content = get_placeholder_content(context, request, page, name, inherit)
+        if self.use_cache(request, page, name):
+            content = self.get_cached_content(context, request, page, name, inherit, width)
+        else:
+            content = get_placeholder_content(context, request, page, name, inherit)
         if not content and nodelist:
             return nodelist.render(context)
         return content
 
+    def use_cache(self, request, page, name):
+        """
+        Placeholders of public pages are cached if CMS_PLACEHOLDER_CONF says
+        so, except in edit mode.
+        """
+        if page.publisher_is_draft:
+            return False
+        if getattr(request, 'toolbar', None) and getattr(request.toolbar, 'edit_mode'):
+            return False
+        return get_placeholder_conf('cache', name, page.get_template(), False)
+
+    def get_cached_content(self, context, request, page, name, inherit, width):
+        lang = get_language()
+        extra = (inherit, width)
+        cached_value = get_placeholder_cache(page, name, lang, settings.SITE_ID, extra)
+        if cached_value is not None:
+            restore_sekizai(context, cached_value['sekizai'])
+            return mark_safe(cached_value['content'])
+        watcher = Watcher(context)
+        content = get_placeholder_content(context, request, page, name, inherit)
+        set_placeholder_cache(page, name, lang, settings.SITE_ID,
+                              {'content': content, 'sekizai': watcher.get_changes()}, extra)
+        return content
+
     def get_name(self):
         return self.kwargs['name'].var.value.strip('"').strip("'")
 
@@ -393,15 +449,6 @@ class CleanAdminListFilter(InclusionTag):
         return {'title': spec.title(), 'choices': unique_choices}
 
 
-def _restore_sekizai(context, changes):
-    varname = get_varname()
-    sekizai_container = context[varname]
-    for key, values in changes.items():
-        sekizai_namespace = sekizai_container[key]
-        for value in values:
-            sekizai_namespace.append(value)
-
-
 def _show_placeholder_for_page(context, placeholder_name, page_lookup, lang=None,
                                site=None, cache_result=True):
     """
@@ -428,7 +475,7 @@ def _show_placeholder_for_page(context, placeholder_name, page_lookup, lang=None
         cache_key = _clean_key('%s_placeholder:%s' % (base_key, placeholder_name))
         cached_value = cache.get(cache_key)
         if isinstance(cached_value, dict): # new style
-            _restore_sekizai(context, cached_value['sekizai'])
+            restore_sekizai(context, cached_value['sekizai'])
             return {'content': mark_safe(cached_value['content'])}
         elif isinstance(cached_value, basestring): # old style
             return {'content': mark_safe(cached_value)}
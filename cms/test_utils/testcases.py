@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from cms.cache.pages import clear_page_cache
+from cms.cache.plugins import clear_plugin_cache
 from cms.models import Page
 from cms.test_utils.util.context_managers import (UserLoginContext,
     SettingsOverride)
@@ -88,6 +90,10 @@ class CMSTestCase(testcases.TestCase):
     def _post_teardown(self):
         # Needed to clean the menu keys cache, see menu.menu_pool.clear()
         menu_pool.clear()
+        # Resolved pages and rendered plugins don't survive the test database
+        # rollback either
+        clear_page_cache()
+        clear_plugin_cache()
         super(CMSTestCase, self)._post_teardown()
         set_current_user(None)
 
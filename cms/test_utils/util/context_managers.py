@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from cms.utils.conf import clear_cms_settings_cache
 from django.conf import settings
 from django.core.signals import request_started
 from django.db import reset_queries
@@ -27,6 +28,8 @@ class SettingsOverride(object):
         self.overrides = overrides
         self.special_handlers = {
             'TEMPLATE_CONTEXT_PROCESSORS': self.template_context_processors,
+            'CMS_PLUGIN_PROCESSORS': self.plugin_processors,
+            'CMS_PLUGIN_CONTEXT_PROCESSORS': self.plugin_processors,
         }
         
     def __enter__(self):
@@ -34,6 +37,8 @@ class SettingsOverride(object):
         for key, value in self.overrides.items():
             self.old[key] = getattr(settings, key, NULL)
             setattr(settings, key, value)
+            self.special_handlers.get(key, lambda:None)()
+        self.clear_caches()
         
     def __exit__(self, type, value, traceback):
         for key, value in self.old.items():
@@ -42,10 +47,23 @@ class SettingsOverride(object):
             else:
                 delattr(settings,key) # do not pollute the context!
             self.special_handlers.get(key, lambda:None)()
+        self.clear_caches()
     
+    def clear_caches(self):
+        # what is computed from the settings
+        from cms.utils.i18n import clear_language_caches
+        from cms.utils.plugins import clear_template_placeholders
+        clear_cms_settings_cache()
+        clear_language_caches()
+        clear_template_placeholders()
+
     def template_context_processors(self):
         context._standard_context_processors = None
 
+    def plugin_processors(self):
+        from cms.plugin_rendering import clear_standard_processors
+        clear_standard_processors()
+
 
 class StdOverride(object):
     def __init__(self, std='out', buffer=None):
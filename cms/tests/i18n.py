@@ -29,6 +29,18 @@ class TestLanguages(SettingsOverrideTestCase):
         self.assertEqual(i18n.get_language_code(self.settings_overrides['LANGUAGE_CODE']), 'en')
         self.assertEqual(i18n.get_current_language(), 'en')
 
+    def test_language_lookups(self):
+        self.assertEqual(i18n.get_language_code('fr-ca'), 'fr')
+        self.assertEqual(i18n.get_language_code('xx'), 'xx')
+        self.assertEqual(i18n.get_language_list(), ['en', 'fr'])
+        self.assertEqual(i18n.get_public_languages(), ['en'])
+        self.assertEqual(i18n.get_language_object('en-us')['code'], 'en')
+        self.assertEqual(i18n.get_fallback_languages('fr'), ['en'])
+        self.assertRaises(i18n.LanguageError, i18n.get_language_object, 'de')
+        # the lookup table is only built once
+        table = i18n._get_language_table()
+        self.assertTrue(i18n._get_language_table(1) is table)
+
     def test_get_languages_default_site(self):
         result = i18n.get_languages()
         self.assertEqual(2, len(result))
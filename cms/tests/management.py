@@ -8,6 +8,7 @@ from cms.test_utils.util.context_managers import SettingsOverride
 from cms.api import create_page, add_plugin
 from cms.management.commands import cms
 from cms.management.commands.subcommands.list import plugin_report
+from cms.models.pagemodel import Page
 from cms.models.pluginmodel import CMSPlugin
 from cms.models.titlemodels import Title
 from cms.models.placeholdermodel import Placeholder
@@ -224,3 +225,49 @@ class ManagementTestCase(CMSTestCase):
             command.handle("uninstall", "plugins", PLUGIN, interactive=False)
             self.assertEqual(out.getvalue(), "1 'TextPlugin' plugins uninstalled\n")
             self.assertEqual(CMSPlugin.objects.filter(plugin_type=PLUGIN).count(), 0)
+
+    def test_publish(self):
+        from django.contrib.auth.models import User
+        User.objects.create_superuser('djangocms', 'cms@example.com', '123456')
+        root = create_page('root', "nav_playground.html", "en", published=True)
+        child = create_page('child', "nav_playground.html", "en", published=True, parent=root)
+        other = create_page('other', "nav_playground.html", "en", published=True)
+        create_page('draft', "nav_playground.html", "en", published=False, parent=root)
+
+        out = StringIO()
+        command = cms.Command()
+        command.stdout = out
+        command.handle("publish", str(root.pk), interactive=False, dry_run=True)
+        self.assertEqual(out.getvalue(), "root [%d]\nchild [%d]\n" % (root.pk, child.pk))
+
+        out = StringIO()
+        command.stdout = out
+        command.handle("publish", interactive=False, since="2000-01-01")
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[:3], ["root [%d]" % root.pk, "child [%d]" % child.pk, "other [%d]" % other.pk])
+        self.assertTrue(lines[3].startswith("Published 3 of 3 pages"))
+
+        out = StringIO()
+        command.stdout = out
+        command.handle("publish", interactive=False, since="2100-01-01")
+        self.assertTrue(out.getvalue().startswith("Published 0 of 0 pages"))
+        self.assertRaises(management.CommandError, command.handle,
+                          "publish", "nothing", interactive=False)
+
+    def test_publish_pending_child(self):
+        from django.contrib.auth.models import User
+        User.objects.create_superuser('djangocms', 'cms@example.com', '123456')
+        root = create_page('root', "nav_playground.html", "en")
+        # published while its parent isn't, so it waits for it
+        child = create_page('child', "nav_playground.html", "en", published=True, parent=root)
+        self.assertEqual(Page.objects.get(pk=child.pk).publisher_public_id, None)
+        Page.objects.filter(pk=root.pk).update(published=True)
+
+        out = StringIO()
+        command = cms.Command()
+        command.stdout = out
+        command.handle("publish", interactive=False)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[:2], ["root [%d]" % root.pk, "child [%d]" % child.pk])
+        self.assertTrue(lines[2].startswith("Published 2 of 2 pages"))
+        self.assertEqual(Page.objects.public().count(), 2)
@@ -20,8 +20,7 @@ from django.contrib.sites.models import Site
 from django.template import Template, TemplateSyntaxError
 from django.utils.translation import activate
 from menus.base import NavigationNode
-from menus.menu_pool import menu_pool, _build_nodes_inner_for_one_menu
-from menus.models import CacheKey
+from menus.menu_pool import menu_pool, _build_nodes_inner_for_one_menu, FrozenNodes
 from menus.utils import mark_descendants, find_selected, cut_levels
 from django.utils.unittest.case import skipUnless
 
@@ -172,39 +171,58 @@ class FixturesMenuTests(MenusFixture, BaseMenuTest):
     def test_show_menu_num_queries(self):
         context = self.get_context()
         # test standard show_menu
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(3):
             """
             The queries should be:
                 get all pages
                 get all page permissions
                 get all titles
-                get the menu cache key
-                set the menu cache key
             """
             tpl = Template("{% load menu_tags %}{% show_menu %}")
             tpl.render(context)
 
-    def test_show_menu_cache_key_leak(self):
+    def test_show_menu_memoized_per_request(self):
         context = self.get_context()
         tpl = Template("{% load menu_tags %}{% show_menu %}")
-        self.assertEqual(CacheKey.objects.count(), 0)
-        tpl.render(context)
-        self.assertEqual(CacheKey.objects.count(), 1)
-        tpl.render(context)
-        self.assertEqual(CacheKey.objects.count(), 1)
+        output = tpl.render(context)
+        with self.assertNumQueries(0):
+            # the nodes are reused, but every tag gets its own copy
+            self.assertEqual(tpl.render(context), output)
+            Template("{% load menu_tags %}{% show_sub_menu %}").render(context)
+            self.assertEqual(tpl.render(context), output)
+        menu_pool.clear(settings.SITE_ID)
+        with self.assertNumQueries(3):
+            tpl.render(context)
 
-    def test_menu_keys_duplicate_truncates(self):
-        """
-        When two objects with the same characteristics are present in the
-        database, get_or_create truncates the database table to "invalidate"
-        the cache, before retrying. This can happen after migrations, and since
-        it's only cache, we don't want any propagation of errors.
-        """
-        CacheKey.objects.create(language="fr", site=1, key="a")
-        CacheKey.objects.create(language="fr", site=1, key="a")
-        CacheKey.objects.get_or_create(language="fr", site=1, key="a")
+    def test_show_menu_cache_invalidation(self):
+        tpl = Template("{% load menu_tags %}{% show_menu %}")
+        tpl.render(self.get_context())
+        with self.assertNumQueries(0):
+            tpl.render(self.get_context())
+        # other sites and languages don't affect this menu
+        menu_pool.clear(site_id=settings.SITE_ID + 1)
+        menu_pool.clear(language='de')
+        menu_pool.clear(site_id=settings.SITE_ID, language='de')
+        with self.assertNumQueries(0):
+            tpl.render(self.get_context())
+        for kwargs in [{'site_id': settings.SITE_ID}, {'language': 'en'},
+                       {'site_id': settings.SITE_ID, 'language': 'en'}, {'all': True}, {}]:
+            menu_pool.clear(**kwargs)
+            with self.assertNumQueries(3):
+                tpl.render(self.get_context())
 
-        self.assertEqual(CacheKey.objects.count(), 1)
+    def test_delay_clear(self):
+        tpl = Template("{% load menu_tags %}{% show_menu %}")
+        tpl.render(self.get_context())
+        with menu_pool.delay_clear():
+            with menu_pool.delay_clear():
+                menu_pool.clear(settings.SITE_ID)
+            menu_pool.clear(settings.SITE_ID)
+            # nothing was invalidated yet
+            with self.assertNumQueries(0):
+                tpl.render(self.get_context())
+        with self.assertNumQueries(3):
+            tpl.render(self.get_context())
 
     def test_only_active_tree(self):
         context = self.get_context()
@@ -520,12 +538,40 @@ class MenuTests(BaseMenuTest):
 
     def test_build_nodes_inner_for_circular_menu(self):
         '''
-        TODO: 
-            To properly handle this test we need to have a circular dependency 
-            detection system.
-            Go nuts implementing it :)
+            Tests a circular menu tree, the nodes of the cycle are reported
+            as orphans
+
+            node1
+             node2
+              node3
+               node2 (circular)
+        '''
+        node1 = NavigationNode('Test1', '/test1/', 1, None)
+        node2 = NavigationNode('Test2', '/test2/', 2, 3)
+        node3 = NavigationNode('Test3', '/test3/', 3, 2)
+        node4 = NavigationNode('Test4', '/test4/', 4, 1)
+
+        orphans = []
+        final_list = _build_nodes_inner_for_one_menu(
+            [node1, node2, node3, node4], 'Test', orphans.extend)
+        self.assertEqual(final_list, [node1, node4])
+        self.assertEqual(orphans, [node2, node3])
+        self.assertEqual(node1.children, [node4])
+        self.assertEqual(node2.parent, None)
+        self.assertEqual(node3.parent, None)
+
+    def test_build_nodes_inner_for_large_menu(self):
         '''
-        pass
+            Micro benchmark: 50000 nodes, every node listed before its parent.
+            Building the tree must stay linear (this used to be quadratic).
+        '''
+        count = 50000
+        nodes = [NavigationNode('Test%s' % i, '/test%s/' % i, i, i // 2 or None)
+                 for i in range(count - 1, 0, -1)]
+        final_list = _build_nodes_inner_for_one_menu(nodes, 'Test')
+        self.assertEqual(len(final_list), count - 1)
+        self.assertEqual(final_list[0].id, 1)
+        self.assertEqual(len(final_list[0].get_descendants()), count - 2)
 
     def test_build_nodes_inner_for_broken_menu(self):
         '''
@@ -548,8 +594,10 @@ class MenuTests(BaseMenuTest):
         menu_class_name = 'Test'
         nodes = [node1, node2, node3, node4, node5, ]
 
-        final_list = _build_nodes_inner_for_one_menu(nodes, menu_class_name)
+        orphans = []
+        final_list = _build_nodes_inner_for_one_menu(nodes, menu_class_name, orphans.extend)
         self.assertEqual(len(final_list), 3)
+        self.assertEqual(orphans, [node1, node2])
         self.assertFalse(node1 in final_list)
         self.assertFalse(node2 in final_list)
 
@@ -565,6 +613,54 @@ class MenuTests(BaseMenuTest):
         self.assertEqual(node4.children, [node3])
         self.assertEqual(node5.children, [node4])
 
+    def test_frozen_nodes(self):
+        tree, nodes = self._get_nodes('/1/')
+        frozen = FrozenNodes(tree)
+        thawed = frozen.thaw()
+        self.assertEqual([node.id for node in thawed], [node.id for node in tree])
+        self.assertEqual([node.get_absolute_url() for node in thawed],
+                         [node.get_absolute_url() for node in tree])
+        self.assertEqual(thawed[1].parent, thawed[0])
+        self.assertEqual(thawed[1].children, [thawed[2], thawed[3]])
+        self.assertEqual(thawed[4].parent, None)
+        self.assertTrue(thawed[0].selected)
+        # every thaw returns independent nodes
+        thawed[0].selected = False
+        thawed[0].attr['changed'] = True
+        thawed[1].children.remove(thawed[2])
+        other = frozen.thaw()
+        self.assertTrue(other[0].selected)
+        self.assertFalse('changed' in other[0].attr)
+        self.assertEqual(other[1].children, [other[2], other[3]])
+
+    def test_frozen_nodes_nested_values(self):
+        tree, nodes = self._get_nodes('/1/')
+        tree[0].attr['classes'] = ['first']
+        tree[0].tags = set(['a'])
+        frozen = FrozenNodes(tree)
+        thawed = frozen.thaw()
+        thawed[0].attr['classes'].append('selected')
+        thawed[0].tags.add('b')
+        other = frozen.thaw()
+        self.assertEqual(other[0].attr['classes'], ['first'])
+        self.assertEqual(other[0].tags, set(['a']))
+
+    def test_mark_selected(self):
+        nodes = [
+            NavigationNode('1', '/', 1),
+            NavigationNode('2', '/a/', 2, 1),
+            NavigationNode('3', '/a/b/', 3, 2),
+            NavigationNode('4', '/a/b/', 4, 2),
+            NavigationNode('5', '/a/bc/', 5, 2),
+        ]
+        tree = _build_nodes_inner_for_one_menu(nodes, "test")
+        frozen = FrozenNodes(tree, index_urls=True)
+        for path, selected_id in [('/a/b/c/', 3), ('/a/bc/', 5), ('/a/', 2), ('/b/', 1)]:
+            request = self.get_request(path)
+            for url_index in (frozen.url_index, None):
+                marked = menu_pool._mark_selected(request, frozen.thaw(), url_index)
+                self.assertEqual([node.id for node in marked if node.selected], [selected_id])
+
     def test_utils_mark_descendants(self):
         tree_nodes, flat_nodes = self._get_nodes()
         mark_descendants(tree_nodes)
@@ -779,14 +875,12 @@ class ShowSubMenuCheck(SubMenusFixture, BaseMenuTest):
         page = self.get_page(6)
         context = self.get_context(page.get_absolute_url())
         # test standard show_menu
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(3):
             """
             The queries should be:
                 get all pages
                 get all page permissions
                 get all titles
-                get the menu cache key
-                set the menu cache key
             """
             tpl = Template("{% load menu_tags %}{% show_sub_menu %}")
             tpl.render(context)
@@ -846,14 +940,12 @@ class ShowMenuBelowIdTests(BaseMenuTest):
 
         with LanguageOverride('en'):
             context = self.get_context(a.get_absolute_url())
-            with self.assertNumQueries(5):
+            with self.assertNumQueries(3):
                 """
                 The queries should be:
                     get all pages
                     get all page permissions
                     get all titles
-                    get the menu cache key
-                    set the menu cache key
                 """
                 # Actually seems to run:
                 tpl = Template("{% load menu_tags %}{% show_menu_below_id 'a' 0 100 100 100 %}")
@@ -5,12 +5,13 @@ from django.contrib.sites.models import Site
 from django.contrib.auth.models import AnonymousUser, User, Group
 
 from cms.api import create_page
-from cms.menu import get_visible_pages
+from cms.menu import get_visible_pages, get_view_restrictions
 from cms.models import Page
 from cms.models import ACCESS_DESCENDANTS, ACCESS_CHILDREN, ACCESS_PAGE
 from cms.models import ACCESS_PAGE_AND_CHILDREN, ACCESS_PAGE_AND_DESCENDANTS
 from cms.models.permissionmodels import GlobalPagePermission, PagePermission
 from cms.test_utils.testcases import SettingsOverrideTestCase
+from cms.test_utils.util.context_managers import SettingsOverride
 from menus.menu_pool import menu_pool
 
 
@@ -282,6 +283,30 @@ class ViewPermissionComplexMenuAllNodesTests(ViewPermissionTests):
         nodes = menu_pool.get_nodes(request)
         self.assertEqual(len(nodes), len(all_pages))
 
+    def test_view_restrictions_num_queries(self):
+        """
+        Grants on children and descendants are expanded without a query per
+        grant
+        """
+        self._setup_user_groups()
+        all_pages = self._setup_tree_pages()
+        self._setup_view_restrictions()
+        with self.assertNumQueries(2):
+            """
+            The queries are:
+            PagePermission query for all the grants
+            Page query for the trees of the restricted pages
+            """
+            restricted_pages = get_view_restrictions(self.site)
+        urls = self.get_url_dict(all_pages)
+        page_b_b_a_a = urls["/en/page_b/page_b_b/page_b_b_a/page_b_b_a_a/"]
+        group_3 = Group.objects.get(name=self.GROUPNAME_3)
+        group_4 = Group.objects.get(name=self.GROUPNAME_4)
+        self.assertEqual(sorted(restricted_pages[page_b_b_a_a.pk]),
+                         sorted([(None, group_3.pk), (None, group_4.pk)]))
+        self.assertEqual(restricted_pages[page_b_b_a_a.pk],
+                         restricted_pages[page_b_b_a_a.publisher_public_id])
+
     def test_public_menu_anonymous_user(self):
         """
         Anonymous user should only see the pages in the rendered menu
@@ -484,6 +509,107 @@ class ViewPermissionComplexMenuAllNodesTests(ViewPermissionTests):
         self.assertViewAllowed(urls["/en/page_d/page_d_a/"], user)
 
 
+
+class ViewPermissionSharedMenuCacheTests(ViewPermissionComplexMenuAllNodesTests):
+    """
+    Same as ViewPermissionComplexMenuAllNodesTests, but with a single menu tree
+    cached for all the users
+    """
+    settings_overrides = {
+        'CMS_PERMISSION': True,
+        'CMS_PUBLIC_FOR': 'all',
+        'CMS_SHARED_MENU_CACHE': True,
+    }
+
+    def test_menu_cache_shared_between_users(self):
+        self._setup_user_groups()
+        all_pages = self._setup_tree_pages()
+        self._setup_view_restrictions()
+        urls = self.get_url_dict(all_pages)
+        self.assertInMenu(urls["/en/page_b/"], User.objects.get(username='user_1'))
+        self.assertNotInMenu(urls["/en/page_b/"], AnonymousUser())
+        user = User.objects.get(username='user_2')
+        self.assertNotInMenu(urls["/en/page_b/"], user)
+        with self.assertNumQueries(0):
+            menu_pool._build_nodes(self.get_request(user, urls["/en/page_b/"]), self.site.pk)
+
+    def test_hidden_selected_page(self):
+        """
+        If the current page is hidden, the closest visible page is selected
+        """
+        self._setup_user_groups()
+        all_pages = self._setup_tree_pages()
+        self._setup_view_restrictions()
+        urls = self.get_url_dict(all_pages)
+        request = self.get_request(AnonymousUser(), urls["/en/page_b/page_b_a/"])
+        nodes = menu_pool.get_nodes(request)
+        selected = [node.get_absolute_url() for node in nodes if node.selected]
+        self.assertEqual(selected, ["/en/"])
+
+    def _get_menu_tree(self, user, path):
+        request = self.get_request(user)
+        request.path = path
+        return [(node.get_absolute_url(),
+                 node.parent and node.parent.get_absolute_url(),
+                 node.attr.get('is_home', False), node.selected,
+                 [child.get_absolute_url() for child in node.children])
+                for node in menu_pool.get_nodes(request)]
+
+    def assertSameMenuTree(self, user, path):
+        menu_pool.clear()
+        shared = self._get_menu_tree(user, path)
+        with SettingsOverride(CMS_SHARED_MENU_CACHE=False):
+            menu_pool.clear()
+            self.assertEqual(self._get_menu_tree(user, path), shared)
+        return shared
+
+    def test_hidden_home_page(self):
+        """
+        A user who can't see the home page gets the same tree as with a menu
+        cached per user: the first visible page is their home page
+        """
+        self._setup_user_groups()
+        stdkwargs = {
+            'template': 'nav_playground.html',
+            'language': 'en',
+            'published': True,
+            'in_navigation': True,
+        }
+        page_a = create_page("page_a", **stdkwargs)
+        create_page("page_a_a", parent=page_a, **stdkwargs)
+        page_b = create_page("page_b", **stdkwargs)
+        create_page("page_b_a", parent=page_b, **stdkwargs)
+        create_page("page_c", **stdkwargs)
+        permission = PagePermission.objects.create(
+            can_view=True, page=page_a, grant_on=ACCESS_PAGE_AND_DESCENDANTS,
+            group=Group.objects.get(name=self.GROUPNAME_1))
+        user = User.objects.get(username='user_2')
+
+        tree = self.assertSameMenuTree(user, "/en/")
+        self.assertEqual(tree, [
+            ("/en/", None, True, True, ["/en/page_b/page_b_a/"]),
+            ("/en/page_b/page_b_a/", "/en/", False, False, []),
+            ("/en/page_c/", None, False, False, []),
+        ])
+        self.assertSameMenuTree(user, "/en/page_b/page_b_a/")
+        self.assertSameMenuTree(User.objects.get(username='user_1'), "/en/")
+
+        # the children of a home page which is not in the navigation are cut
+        # from it
+        Page.objects.filter(pk__in=[page_b.pk, page_b.publisher_public_id]).update(
+            in_navigation=False)
+        tree = self.assertSameMenuTree(user, "/en/page_b/page_b_a/")
+        self.assertEqual(tree, [
+            ("/en/", None, True, False, []),
+            ("/en/page_b/page_b_a/", None, False, True, []),
+            ("/en/page_c/", None, False, False, []),
+        ])
+
+        # the first visible page is the orphaned child of the hidden home page
+        permission.grant_on = ACCESS_PAGE
+        permission.save()
+        self.assertSameMenuTree(user, "/en/page_b/page_b_a/")
+
 class ViewPermissionTreeBugTests(ViewPermissionTests):
     """Test issue 1113
     https://github.com/divio/django-cms/issues/1113
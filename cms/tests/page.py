@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import with_statement
 import datetime
+import re
 from cms import constants
 import os.path
 
@@ -15,6 +16,7 @@ from django.utils import timezone
 from cms.admin.forms import PageForm
 from cms.admin.pageadmin import PageAdmin
 from cms.api import create_page, add_plugin
+from cms.cache.pages import get_cache_key as get_page_cache_key
 from cms.models import Page, Title
 from cms.models.placeholdermodel import Placeholder
 from cms.models.pluginmodel import CMSPlugin
@@ -29,8 +31,9 @@ from cms.test_utils.util.context_managers import (LanguageOverride,
                                                   SettingsOverride,
                                                   UserLoginContext)
 from cms.utils import get_cms_setting
-from cms.utils.page_resolver import get_page_from_request, is_valid_url
-from cms.utils.page import is_valid_page_slug
+from cms.utils.page_resolver import (get_page_from_request, get_page_from_path,
+    is_valid_url)
+from cms.utils.page import is_valid_page_slug, get_copy_slug
 
 class PagesTestCase(CMSTestCase):
     
@@ -294,6 +297,45 @@ class PagesTestCase(CMSTestCase):
 
         self.assertEqual(Page.objects.drafts().count() - count, 3)
 
+    def test_copy_page_subtree(self):
+        home = create_page("home", "nav_playground.html", "en")
+        page_a = create_page("page_a", "nav_playground.html", "en", parent=home)
+        page_a_a = create_page("page_a_a", "nav_playground.html", "en", parent=page_a)
+        create_page("page_a_a_a", "nav_playground.html", "en", parent=page_a_a)
+        create_page("page_a_b", "nav_playground.html", "en", parent=page_a)
+        add_plugin(page_a_a.placeholders.get(slot="body"), "TextPlugin", "en", body="text")
+        page_b = create_page("page_b", "nav_playground.html", "en", parent=home)
+
+        copies = [self.reload(page_a).copy_page(self.reload(page_b), page_a.site, "last-child")
+                  for i in range(2)]
+        path = page_b.get_path()
+
+        for copy, slug in zip(copies, ["page_a", "page_a-copy"]):
+            copy = self.reload(copy)
+            self.assertEqual(copy.parent_id, page_b.pk)
+            self.assertEqual([(page.get_slug(), page.get_path()) for page in
+                              copy.get_descendants(include_self=True)], [
+                (slug, "%s/%s" % (path, slug)),
+                ("page_a_a", "%s/%s/page_a_a" % (path, slug)),
+                ("page_a_a_a", "%s/%s/page_a_a/page_a_a_a" % (path, slug)),
+                ("page_a_b", "%s/%s/page_a_b" % (path, slug)),
+            ])
+            copy_a_a = copy.get_children()[0]
+            plugin = copy_a_a.placeholders.get(slot="body").cmsplugin_set.get()
+            self.assertEqual(plugin.get_plugin_instance()[0].body, "text")
+        # the tree fields of all pages nest as their parents do
+        for page in Page.objects.all():
+            self.assertEqual(list(page.get_children().values_list('pk', flat=True)),
+                             list(Page.objects.filter(parent=page).order_by('lft').values_list('pk', flat=True)))
+            self.assertEqual(page.get_descendant_count(), Page.objects.filter(
+                tree_id=page.tree_id, lft__gt=page.lft, rght__lt=page.rght).count())
+
+
+    def test_copy_slug(self):
+        self.assertEqual(get_copy_slug("page"), "page-copy")
+        self.assertEqual(get_copy_slug("page-copy"), "page-copy-2")
+        self.assertEqual(get_copy_slug("page-copy-9"), "page-copy-10")
+        self.assertEqual(get_copy_slug("page-copy-10"), "page-copy-11")
 
     def test_language_change(self):
         superuser = self.get_superuser()
@@ -589,6 +631,30 @@ class PagesTestCase(CMSTestCase):
         page = get_page_from_request(request)
         self.assertEqual(page, None)
 
+    def test_get_page_from_path_cached(self):
+        create_page("home", "nav_playground.html", "en", published=True)
+        page = create_page("page", "nav_playground.html", "en", slug="page",
+                           published=True)
+        found_page = get_page_from_path('page')
+        self.assertEqual(found_page.pk, page.publisher_public_id)
+        with self.assertNumQueries(0):
+            found_page = get_page_from_path('page')
+            self.assertEqual(found_page.get_languages(), ['en'])
+            self.assertEqual(found_page.get_title('en'), 'page')
+            self.assertEqual(found_page.get_template(), 'nav_playground.html')
+        title = page.get_title_obj('en')
+        title.slug = 'moved'
+        title.save()
+        page.publish()
+        self.assertEqual(get_page_from_path('page'), None)
+        self.assertEqual(get_page_from_path('moved').pk, page.publisher_public_id)
+
+    def test_page_cache_key(self):
+        # the keys have to be valid memcached keys, whatever the path
+        key = get_page_cache_key(1, u'a path/with spaces\n' + u'x' * 300, False, False)
+        self.assertFalse(re.search(r'\s', key))
+        self.assertTrue(len(key) < 250)
+
     def test_page_already_expired(self):
         """
         Test that a page which has a end date in the past gives a 404, not a
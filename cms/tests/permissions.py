@@ -2,6 +2,7 @@
 from django.contrib.sites.models import Site
 from cms.models import Page
 from cms.api import create_page, assign_user_to_page
+from cms.cache import delay_invalidation
 from cms.cache.permissions import (get_permission_cache, set_permission_cache,
                                    clear_user_permission_cache)
 from cms.test_utils.testcases import SettingsOverrideTestCase
@@ -35,6 +36,18 @@ class PermissionCacheTests(SettingsOverrideTestCase):
         cached_permissions = get_permission_cache(self.user_normal, "can_change")
         self.assertIsNone(cached_permissions)
     
+    def test_delayed_clear(self):
+        set_permission_cache(self.user_normal, "can_change", [self.home_page.id])
+        set_permission_cache(self.user_super, "can_change", [self.home_page.id])
+        with delay_invalidation():
+            clear_user_permission_cache(self.user_normal)
+            clear_user_permission_cache(self.user_super)
+            clear_user_permission_cache(self.user_normal)
+            self.assertEqual(get_permission_cache(self.user_normal, "can_change"),
+                             [self.home_page.id])
+        self.assertIsNone(get_permission_cache(self.user_normal, "can_change"))
+        self.assertIsNone(get_permission_cache(self.user_super, "can_change"))
+
     def test_cache_invalidation(self):
         """
         Test permission cache clearing on page save
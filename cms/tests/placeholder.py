@@ -19,7 +19,7 @@ from cms.test_utils.util.context_managers import (SettingsOverride,
     UserLoginContext)
 from cms.test_utils.util.mock import AttributeObject
 from cms.utils.placeholder import PlaceholderNoAction, MLNGPlaceholderActions
-from cms.utils.plugins import get_placeholders
+from cms.utils.plugins import get_placeholders, warm_template_placeholders
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.models import User, Permission
@@ -80,6 +80,28 @@ class PlaceholderTestCase(CMSTestCase):
                                         get_placeholders, 'placeholder_tests/test_seven.html')
         self.assertEqual(sorted(placeholders), sorted([u'one']))
 
+    def test_placeholder_scanning_cached(self):
+        from cms.utils import plugins
+        placeholders = get_placeholders('placeholder_tests/test_one.html')
+        self.assertEqual(plugins._template_placeholders['placeholder_tests/test_one.html'],
+                         tuple(placeholders))
+        # served from the cache, changes to the returned list don't leak into it
+        placeholders.append('changed')
+        self.assertEqual(sorted(get_placeholders('placeholder_tests/test_one.html')),
+                         sorted([u'new_one', u'two', u'three']))
+        with SettingsOverride(DEBUG=True):
+            plugins._template_placeholders['placeholder_tests/test_one.html'] = ('stale',)
+            self.assertEqual(sorted(get_placeholders('placeholder_tests/test_one.html')),
+                             sorted([u'new_one', u'two', u'three']))
+
+    def test_warm_template_placeholders(self):
+        from cms.utils import plugins
+        with SettingsOverride(CMS_TEMPLATES=[('col_two.html', 'two columns')]):
+            self.assertEqual(warm_template_placeholders(),
+                             [('col_two.html', ['col_sidebar', 'col_left'])])
+            self.assertEqual(plugins._template_placeholders['col_two.html'],
+                             ('col_sidebar', 'col_left'))
+
     def test_placeholder_scanning_extend_outside_block(self):
         placeholders = get_placeholders('placeholder_tests/outside.html')
         self.assertEqual(sorted(placeholders), sorted([u'new_one', u'two', u'base_outside']))
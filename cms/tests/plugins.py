@@ -8,14 +8,16 @@ from cms.models import Page, Placeholder
 from cms.models.pluginmodel import CMSPlugin, PluginModelBase
 from cms.plugin_base import CMSPluginBase
 from cms.plugin_pool import plugin_pool
-from cms.plugins.utils import get_plugins_for_page
+from cms.plugins.utils import get_plugins_for_page, downcast_plugins
 from cms.plugins.file.models import File
 from cms.plugins.inherit.models import InheritPagePlaceholder
 from cms.plugins.link.forms import LinkForm
 from cms.plugins.link.models import Link
 from cms.plugins.picture.models import Picture
+from cms.plugins.text import models as text_models
 from cms.plugins.text.models import Text
-from cms.plugins.text.utils import (plugin_tags_to_id_list, plugin_tags_to_admin_html)
+from cms.plugins.text.utils import (plugin_tags_to_id_list, plugin_tags_to_admin_html,
+    split_plugin_tags)
 from cms.plugins.twitter.models import TwitterRecentEntries
 from cms.test_utils.project.pluginapp.models import Article, Section
 from cms.test_utils.project.pluginapp.plugins.manytomany_rel.models import (
@@ -320,6 +322,39 @@ class PluginsTestCase(PluginsTestBaseCase):
 
         self.assertEqual(text_plugin_de.body, text_plugin_en.body)
 
+    def test_copy_plugins_tree(self):
+        """
+        The copies get their tree fields up front, instead of being moved into
+        place one by one.
+        """
+        page_en = create_page("CopyPluginTestPage (EN)", "nav_playground.html", "en")
+        page_de = create_page("CopyPluginTestPage (DE)", "nav_playground.html", "de")
+        ph_en = page_en.placeholders.get(slot="body")
+        ph_de = page_de.placeholders.get(slot="body")
+        text_plugin_en = add_plugin(ph_en, "TextPlugin", "en", body="Hello World")
+        for i in range(2):
+            add_plugin(ph_en, "LinkPlugin", "en", target=text_plugin_en,
+                       name="Link %s" % i, url="https://www.django-cms.org")
+        add_plugin(ph_en, "LinkPlugin", "en", name="Link", url="https://www.django-cms.org")
+        plugins = list(ph_en.get_plugins())
+
+        # 1 for the base plugins, 2 for the text and link plugins, 1 for the
+        # next tree id, 2 for each copy and 4 for fixing the body of the text
+        with self.assertNumQueries(16):
+            copy_plugins_to(plugins, ph_de, 'de')
+
+        text_plugin_de = ph_de.cmsplugin_set.get(parent=None, plugin_type="TextPlugin")
+        self.assertEqual(text_plugin_de.get_descendant_count(), 2)
+        self.assertEqual([plugin.get_plugin_instance()[0].name for plugin in text_plugin_de.get_children()],
+                         ["Link 0", "Link 1"])
+        # the copies are valid trees, the english ones are untouched
+        for plugin in CMSPlugin.objects.all():
+            self.assertEqual(plugin.get_descendant_count(),
+                             CMSPlugin.objects.filter(tree_id=plugin.tree_id,
+                                                      lft__gt=plugin.lft,
+                                                      rght__lt=plugin.rght).count())
+        self.assertEqual(CMSPlugin.objects.filter(language='en').count(), 4)
+        self.assertEqual(CMSPlugin.objects.filter(language='de').count(), 4)
 
     def test_remove_plugin_before_published(self):
         """
@@ -562,6 +597,113 @@ class PluginsTestCase(PluginsTestBaseCase):
         for i in range(0, 10):
             self.assertTrue('A Link %d' % i in rendered)
 
+    def test_render_textplugins_of_placeholder(self):
+        page = create_page("render test", "nav_playground.html", "en")
+        ph = page.placeholders.get(slot="body")
+        for i in range(0, 3):
+            text_plugin = add_plugin(ph, "TextPlugin", "en", body="Text %d" % i)
+            for j in range(0, 3):
+                link = add_plugin(ph, "LinkPlugin", "en", target=text_plugin,
+                                  name="A Link %d-%d" % (i, j),
+                                  url="http://django-cms.org")
+                text_plugin.body += '{{ plugin_object %d }}' % link.pk
+            text_plugin.body = plugin_tags_to_admin_html(text_plugin.body)
+            text_plugin.save()
+        ph = Placeholder.objects.get(pk=ph.pk)
+        context = self.get_context()
+        context['request'].current_page = None
+        # 1 query for the CMSPlugin objects, 1 for each plugin type, 1 for the
+        # page of the placeholder and none for the plugins embedded in the texts
+        with self.assertNumQueries(4):
+            rendered = ph.render(context, None)
+        for i in range(0, 3):
+            for j in range(0, 3):
+                self.assertTrue('A Link %d-%d' % (i, j) in rendered)
+
+        # texts rendered on their own share the lookup of their children
+        texts = list(Text.objects.filter(placeholder=ph))
+        with self.assertNumQueries(2):
+            for text in texts:
+                rendered = text.render_plugin(context, placeholder=ph)
+                self.assertTrue('A Link %d-2' % texts.index(text) in rendered)
+
+    def test_textplugin_body_segments(self):
+        page = create_page("render test", "nav_playground.html", "en")
+        ph = page.placeholders.get(slot="body")
+        text_plugin = add_plugin(ph, "TextPlugin", "en", body="Hello")
+        link = add_plugin(ph, "LinkPlugin", "en", target=text_plugin,
+                          name="A Link", url="http://django-cms.org")
+        text_plugin.body = plugin_tags_to_admin_html(
+            '<p>Hello {{ plugin_object %d }} World</p>' % link.pk)
+        text_plugin.save()
+        segments = split_plugin_tags(text_plugin.body)
+        self.assertEqual(segments, [u'<p>Hello ', link.pk, u' World</p>'])
+
+        # compiled once per process, texts with the same body share it
+        text_plugin = self.reload(text_plugin)
+        self.assertEqual(text_plugin.get_body_segments(), segments)
+        self.assertTrue(self.reload(text_plugin).get_body_segments() is
+                        text_plugin.get_body_segments())
+        rendered = text_plugin.render_plugin(placeholder=ph)
+        self.assertTrue(rendered.startswith('<p>Hello '))
+        self.assertTrue('A Link' in rendered)
+        self.assertTrue(rendered.endswith(' World</p>'))
+
+        # unsaved changes of the body are picked up
+        text_plugin.body = '<p>Bye</p>'
+        self.assertEqual(text_plugin.get_body_segments(), [u'<p>Bye</p>'])
+        text_plugin = self.reload(text_plugin)
+        text_plugin.body = '<p>Bye</p>'
+        self.assertEqual(text_plugin.get_body_segments(), [u'<p>Bye</p>'])
+
+        # a new save gets compiled again
+        text_plugin.save()
+        self.assertEqual(self.reload(text_plugin).get_body_segments(),
+                         [u'<p>Bye</p>'])
+
+    def test_textplugin_body_segments_cache_size(self):
+        page = create_page("render test", "nav_playground.html", "en")
+        ph = page.placeholders.get(slot="body")
+        texts = [add_plugin(ph, "TextPlugin", "en", body="%d" % i * 10)
+                 for i in range(0, 3)]
+        old_size = text_models.BODY_SEGMENTS_CACHE_SIZE
+        text_models.BODY_SEGMENTS_CACHE_SIZE = 20
+        try:
+            segments = self.reload(texts[0]).get_body_segments()
+            self.reload(texts[1]).get_body_segments()
+            # using the first text again leaves the second as the oldest one
+            self.assertTrue(self.reload(texts[0]).get_body_segments() is segments)
+            self.reload(texts[2]).get_body_segments()
+            cached = text_models._body_segments_cache
+            self.assertTrue((texts[0].pk, texts[0].changed_date) in cached)
+            self.assertFalse((texts[1].pk, texts[1].changed_date) in cached)
+            self.assertTrue((texts[2].pk, texts[2].changed_date) in cached)
+            self.assertEqual(text_models._body_segments_size[0], 20)
+        finally:
+            text_models.BODY_SEGMENTS_CACHE_SIZE = old_size
+
+    def test_render_page_links(self):
+        home = create_page("home", "nav_playground.html", "en", published=True)
+        targets = [create_page("target %d" % i, "nav_playground.html", "en",
+                               parent=home, published=True) for i in range(0, 5)]
+        page = create_page("render test", "nav_playground.html", "en")
+        ph = page.placeholders.get(slot="body")
+        for target in [home] + targets:
+            add_plugin(ph, "LinkPlugin", "en", name=target.get_title(),
+                       page_link=target)
+        add_plugin(ph, "TeaserPlugin", "en", title="Teaser", page_link=targets[0])
+        ph = Placeholder.objects.get(pk=ph.pk)
+        context = self.get_context()
+        context['request'].current_page = None
+        # 1 query for the CMSPlugin objects, 1 for each plugin type, 1 for the
+        # page of the placeholder, 1 for the home page and 2 for each plugin
+        # type for the linked pages and their titles, whatever the number of
+        # links
+        with self.assertNumQueries(9):
+            rendered = ph.render(context, None)
+        for target in [home] + targets:
+            self.assertTrue('href="%s"' % target.get_absolute_url() in rendered)
+
     def test_copy_textplugin(self):
         """
         Test that copying of textplugins replaces references to copied plugins
@@ -714,6 +856,32 @@ class PluginsTestCase(PluginsTestBaseCase):
         self.assertRaises(CMSPlugin.DoesNotExist, page_plugins.get, pk=text_plugin_2.pk)
         self.assertEquals(db_text_plugin_1.pk, text_plugin_1.pk)
 
+    def test_downcast_plugins(self):
+        plugin_pool.register_plugin(DumbFixturePlugin)
+        placeholder = Placeholder.objects.create(slot="test")
+        text_plugin_1 = add_plugin(placeholder, "TextPlugin", "en", body="first")
+        link_plugin = add_plugin(placeholder, "LinkPlugin", "en", name="link",
+                                 url="http://www.example.com/")
+        dumb_plugin = add_plugin(placeholder, "DumbFixturePlugin", "en")
+        text_plugin_2 = add_plugin(placeholder, "TextPlugin", "en", body="second")
+        queryset = CMSPlugin.objects.filter(placeholder=placeholder).order_by('position')
+        # the base rows, then the text and link columns, nothing for the
+        # plugin without a model of its own
+        with self.assertNumQueries(3):
+            plugins = downcast_plugins(queryset, select_placeholder=True)
+            self.assertEqual([plugin.placeholder.slot for plugin in plugins], ['test'] * 4)
+        self.assertEqual([plugin.pk for plugin in plugins],
+                         [text_plugin_1.pk, link_plugin.pk, dumb_plugin.pk, text_plugin_2.pk])
+        self.assertEqual([plugin.__class__ for plugin in plugins], [Text, Link, CMSPlugin, Text])
+        self.assertEqual(plugins[0].body, "first")
+        self.assertEqual(plugins[1].url, "http://www.example.com/")
+        self.assertEqual(plugins[1].position, link_plugin.position)
+        self.assertEqual(plugins[3].placeholder, placeholder)
+        plugins[3].body = "changed"
+        plugins[3].save()
+        self.assertEqual(Text.objects.get(pk=text_plugin_2.pk).body, "changed")
+        plugin_pool.unregister_plugin(DumbFixturePlugin)
+
     def test_is_last_in_placeholder(self):
         """
         Tests that children plugins don't affect the is_last_in_placeholder plugin method.
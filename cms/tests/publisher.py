@@ -3,10 +3,11 @@ from __future__ import with_statement
 from django.contrib.auth.models import User
 from django.core.management.base import CommandError
 from django.core.urlresolvers import reverse
+from django.db.models import signals
 
 from cms.api import create_page, add_plugin
 from cms.management.commands import publisher_publish
-from cms.models import CMSPlugin
+from cms.models import CMSPlugin, Title
 from cms.models.pagemodel import Page
 from cms.test_utils.testcases import SettingsOverrideTestCase as TestCase
 from cms.test_utils.util.context_managers import StdoutOverride
@@ -559,6 +560,87 @@ class PublishingTests(TestCase):
         self.assertEquals(plugins[0].body, "Deleted content")
         self.assertEquals(plugins[1].body, "Public content")
 
+    def test_republish_only_changed(self):
+        page = self.create_page(published=True)
+        placeholder = page.placeholders.get(slot=u"body")
+        text_plugin = add_plugin(placeholder, u"TextPlugin", u"en", body="Text")
+        link_plugin = add_plugin(placeholder, u"LinkPlugin", u"en", target=text_plugin,
+                                 name="Link", url="http://example.com")
+        add_plugin(placeholder, u"TextPlugin", u"en", body="Other text")
+        page.publish()
+        public_plugins = dict(CMSPlugin.objects.filter(placeholder__page=page.publisher_public)
+                              .values_list('pk', 'changed_date'))
+
+        link_plugin.name = "Changed link"
+        link_plugin.save()
+        page = page.reload()
+        saved_titles = []
+
+        def title_saved(instance, **kwargs):
+            saved_titles.append(instance)
+        signals.post_save.connect(title_saved, sender=Title)
+        try:
+            page.publish()
+        finally:
+            signals.post_save.disconnect(title_saved, sender=Title)
+
+        # the plugins were updated in place, only the changed one was saved
+        public_page = page.publisher_public
+        self.assertEqual(sorted(public_plugins), sorted(CMSPlugin.objects.filter(
+            placeholder__page=public_page).values_list('pk', flat=True)))
+        changed = [plugin for plugin in CMSPlugin.objects.filter(placeholder__page=public_page)
+                   if plugin.changed_date != public_plugins[plugin.pk]]
+        self.assertEqual(len(changed), 1)
+        self.assertEqual(changed[0].get_plugin_instance()[0].name, "Changed link")
+        self.assertEqual(changed[0].parent.get_plugin_instance()[0].body, "Text")
+        self.assertFalse([title for title in saved_titles if not title.page.publisher_is_draft])
+
+    def test_publish_invalidates_once(self):
+        from cms.cache import pages, plugins
+
+        parent = self.create_page('parent', published=True)
+        self.create_page('child', published=True, parent=parent)
+        page_version = pages.get_cache_version()
+        plugin_version = plugins.get_cache_version()
+        parent.reload().publish()
+        self.assertEqual(pages.get_cache_version(), page_version + 1)
+        self.assertEqual(plugins.get_cache_version(), plugin_version + 1)
+
+    def test_republish_moved_plugin(self):
+        page = self.create_page(published=True)
+        placeholder = page.placeholders.get(slot=u"body")
+        text_plugin = add_plugin(placeholder, u"TextPlugin", u"en", body="Text")
+        link_plugin = add_plugin(placeholder, u"LinkPlugin", u"en", target=text_plugin,
+                                 name="Link", url="http://example.com")
+        page.publish()
+
+        link_plugin = self.reload(link_plugin)
+        link_plugin.parent = None
+        link_plugin.save()
+        page = page.reload()
+        page.publish()
+
+        # the structure changed, so the public placeholder got a fresh copy
+        public_plugins = CMSPlugin.objects.filter(placeholder__page=page.publisher_public)
+        self.assertEqual(public_plugins.count(), 2)
+        self.assertEqual(public_plugins.filter(parent=None).count(), 2)
+
+    def test_republish_changed_behind_changed_date(self):
+        from cms.plugins.link.models import Link
+
+        page = self.create_page(published=True)
+        placeholder = page.placeholders.get(slot=u"body")
+        link_plugin = add_plugin(placeholder, u"LinkPlugin", u"en",
+                                 name="Link", url="http://example.com")
+        page.publish()
+
+        # changed without touching changed_date, like on a server whose clock
+        # is behind
+        Link.objects.filter(pk=link_plugin.pk).update(name="Changed link")
+        page.reload().publish()
+        public_link = Link.objects.get(placeholder__page=page.publisher_public)
+        self.assertEqual(public_link.name, "Changed link")
+
     def test_revert_move(self):
         parent = create_page("Parent", "nav_playground.html", "en", published=True)
         parent_url = parent.get_absolute_url()
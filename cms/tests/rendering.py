@@ -2,17 +2,24 @@
 from __future__ import with_statement
 from cms import plugin_rendering
 from cms.api import create_page, add_plugin
+from cms.cache.plugins import get_cache_version as get_plugin_cache_version
 from cms.models.placeholdermodel import Placeholder
 from cms.models.pluginmodel import CMSPlugin
+from cms.plugins.text.models import Text
+from cms.plugins.text.utils import plugin_tags_to_admin_html
 from cms.plugin_rendering import (render_plugins, PluginContext, 
     render_placeholder_toolbar)
 from cms.test_utils.testcases import SettingsOverrideTestCase
 from cms.test_utils.util.context_managers import SettingsOverride, ChangeModel
 from cms.test_utils.util.mock import AttributeObject
 from django.contrib.auth.models import User
+from django.core.cache.backends.base import CacheKeyWarning
 from django.http import Http404, HttpResponseRedirect
 from django.template import Template, RequestContext
+from django.test.utils import override_settings
 from sekizai.context import SekizaiContext
+import os
+import warnings
 
 TEMPLATE_NAME = 'tests/rendering/base.html'
 
@@ -169,6 +176,18 @@ class RenderingTestCase(SettingsOverrideTestCase):
             self.assertEqual(r, u'1|'+self.test_data['text_main']+'|test_passed_plugin_context_processor_ok|test_plugin_context_processor_ok|'+self.test_data['text_main']+'|main|test_plugin_processor_ok|'+self.test_data['text_main']+'|main|original_context_var_ok')
             plugin_rendering._standard_processors = {}
     
+    def test_processors_loaded_once(self):
+        with SettingsOverride(CMS_PLUGIN_PROCESSORS=('cms.tests.rendering.sample_plugin_processor',)):
+            processors = plugin_rendering.get_processors('PLUGIN_PROCESSORS')
+            self.assertEqual(processors, (sample_plugin_processor,))
+            self.assertTrue(plugin_rendering.get_processors('PLUGIN_PROCESSORS') is processors)
+        self.assertEqual(plugin_rendering.get_processors('PLUGIN_PROCESSORS'), ())
+        # Django's override_settings forgets them too
+        with override_settings(CMS_PLUGIN_PROCESSORS=('cms.tests.rendering.sample_plugin_processor',)):
+            self.assertEqual(plugin_rendering.get_processors('PLUGIN_PROCESSORS'),
+                             (sample_plugin_processor,))
+        self.assertEqual(plugin_rendering.get_processors('PLUGIN_PROCESSORS'), ())
+
     def test_placeholder(self):
         """
         Tests the {% placeholder %} templatetag.
@@ -293,6 +312,20 @@ class RenderingTestCase(SettingsOverrideTestCase):
         r = self.render(t, self.test_page3)
         self.assertEqual(r, u'|'+self.test_data['text_main']+'|'+self.test_data3['text_sub'])
 
+    def test_inherit_placeholder_num_queries(self):
+        """
+        The placeholders of all ancestors are fetched at once, together with
+        those of the current page.
+        """
+        t = u'{% load cms_tags %}'+ \
+            u'|{% placeholder "main" inherit %}|{% placeholder "sub" inherit %}'
+        page = self.reload(self.test_page3)
+        # ancestors, languages, placeholders, plugins and one query per
+        # plugin type
+        with self.assertNumQueries(5):
+            r = self.render(t, page)
+        self.assertEqual(r, u'|'+self.test_data['text_main']+'|'+self.test_data3['text_sub'])
+
     def test_extra_context_isolation(self):
         with ChangeModel(self.test_page, template='extra_context.html'):
             response = self.client.get(self.test_page.get_absolute_url())
@@ -345,3 +378,77 @@ class RenderingTestCase(SettingsOverrideTestCase):
                 ]
             output = render_placeholder_toolbar(placeholder, context, '', 'test')
             self.assertTrue(placeholder_conf_tag in output, 'placeholder name %r is not in %r' % (placeholder_conf_name, output))
+
+    def test_plugin_render_cache(self):
+        from cms.test_utils import project
+
+        plugin = self.test_page.placeholders.get(slot='main').cmsplugin_set.get()
+        template = u'{% load cms_tags sekizai_tags %}{% placeholder "main" %}{% render_block "js" %}'
+        r = self.render(template, self.reload(self.test_page))
+        self.assertEqual(r, self.test_data['text_main'])
+        # changes which don't go through a save are not seen...
+        Text.objects.filter(pk=plugin.pk).update(body='changed')
+        r = self.render(template, self.reload(self.test_page))
+        self.assertEqual(r, self.test_data['text_main'])
+        # ...but saving the plugin does
+        Text.objects.get(pk=plugin.pk).save()
+        r = self.render(template, self.reload(self.test_page))
+        self.assertEqual(r, 'changed')
+        # saving drafts doesn't flush the cached output of other plugins
+        version = get_plugin_cache_version()
+        draft = self.test_page3.publisher_draft
+        draft.placeholders.get(slot='sub').cmsplugin_set.get().save()
+        draft.get_title_obj('en').save()
+        self.assertEqual(get_plugin_cache_version(), version)
+        # sekizai data added by the plugin is replayed from the cache
+        template_dir = os.path.join(os.path.dirname(project.__file__), 'templates', 'alt_plugin_templates',
+                                    'show_placeholder')
+        with SettingsOverride(TEMPLATE_DIRS=[template_dir]):
+            Text.objects.get(pk=plugin.pk).save()
+            r = self.render(template, self.reload(self.test_page))
+            self.assertEqual(r, 'JAVASCRIPT')
+            r = self.render(template, self.reload(self.test_page))
+            self.assertEqual(r, 'JAVASCRIPT')
+
+    def test_plugin_render_cache_children(self):
+        placeholder = self.test_page.placeholders.get(slot='main')
+        text = Text.objects.get(placeholder=placeholder)
+        link = add_plugin(placeholder, 'LinkPlugin', 'en', target=text,
+                          name='link', url='http://django-cms.org')
+        text.body = plugin_tags_to_admin_html('{{ plugin_object %d }}' % link.pk)
+        text.save()
+        template = u'{% load cms_tags %}{% placeholder "main" %}'
+        self.assertTrue('>link<' in self.render(template, self.reload(self.test_page)))
+        # changing an embedded plugin renders its text anew
+        link.name = 'changed'
+        link.save()
+        self.assertTrue('>changed<' in self.render(template, self.reload(self.test_page)))
+
+    def test_cached_placeholder(self):
+        t = u'{% load cms_tags %}'+ \
+            u'|{% placeholder "main" inherit %}|{% placeholder "sub" %}'
+        with SettingsOverride(CMS_PLACEHOLDER_CONF={'main': {'cache': True}}):
+            r = self.render(t, self.reload(self.test_page3))
+            self.assertEqual(r, u'|'+self.test_data['text_main']+'|'+self.test_data3['text_sub'])
+            page = self.reload(self.test_page3)
+            with self.assertNumQueries(0):
+                r = self.render(u'{% load cms_tags %}|{% placeholder "main" inherit %}', page)
+            self.assertEqual(r, u'|'+self.test_data['text_main'])
+            # publishing the page the content is inherited from invalidates
+            # the cached placeholder
+            draft = self.test_page.publisher_draft
+            plugin = draft.placeholders.get(slot='main').cmsplugin_set.get()
+            Text.objects.filter(pk=plugin.pk).update(body='changed')
+            draft.publish()
+            r = self.render(t, self.reload(self.test_page3))
+            self.assertEqual(r, u'|changed|'+self.test_data3['text_sub'])
+
+    def test_cached_placeholder_key(self):
+        t = u'{% load cms_tags %}|{% placeholder "main content" %}|'
+        conf = {'main content': {'cache': True}}
+        with SettingsOverride(CMS_PLACEHOLDER_CONF=conf):
+            with warnings.catch_warnings():
+                # raised by the cache for keys memcached would reject
+                warnings.simplefilter('error', CacheKeyWarning)
+                r = self.render(t, self.reload(self.test_page3))
+        self.assertEqual(r, u'||')
@@ -3,6 +3,7 @@ from __future__ import with_statement
 from cms import constants
 from cms.test_utils.testcases import CMSTestCase
 from cms.test_utils.util.context_managers import SettingsOverride
+from cms.utils.conf import get_cms_setting
 from django.core.exceptions import ImproperlyConfigured
 from django.template.loader import render_to_string
 
@@ -12,3 +13,21 @@ class SettingsTests(CMSTestCase):
         with SettingsOverride(CMS_TEMPLATES=[('subdir/template.html', 'Subdir')], DEBUG=True, TEMPLATE_DEBUG=True):
             context = SekizaiContext()
             self.assertEqual(render_to_string('subdir/template.html', context).strip(), 'test')
+
+    def test_get_cms_setting_cached(self):
+        templates = get_cms_setting('TEMPLATES')
+        self.assertEqual(get_cms_setting('TEMPLATES'), templates)
+        # callers can't change the memoized value
+        templates.append(('changed.html', 'Changed'))
+        get_cms_setting('LANGUAGES')[42] = []
+        self.assertEqual(get_cms_setting('TEMPLATES'), templates[:-1])
+        self.assertFalse(42 in get_cms_setting('LANGUAGES'))
+        templates = get_cms_setting('TEMPLATES')
+        with SettingsOverride(CMS_TEMPLATES=[('subdir/template.html', 'Subdir')]):
+            self.assertEqual(get_cms_setting('TEMPLATES')[0][0], 'subdir/template.html')
+        self.assertEqual(get_cms_setting('TEMPLATES'), templates)
+        # settings changed through django's own override_settings
+        old_prefix = get_cms_setting('CACHE_PREFIX')
+        with self.settings(CMS_CACHE_PREFIX='changed-'):
+            self.assertEqual(get_cms_setting('CACHE_PREFIX'), 'changed-')
+        self.assertEqual(get_cms_setting('CACHE_PREFIX'), old_prefix)
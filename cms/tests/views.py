@@ -2,13 +2,20 @@ from __future__ import with_statement
 from django.contrib.auth.models import Permission
 from cms.api import create_page
 from cms.apphook_pool import apphook_pool
+from cms.cache.responses import get_response_cache
+from cms.middleware.cache import UpdatePageCacheMiddleware
 from cms.models import PagePermission
 from cms.test_utils.testcases import SettingsOverrideTestCase
 from cms.test_utils.util.context_managers import SettingsOverride
 from cms.views import _handle_no_page, details
 from django.conf import settings
+from django.contrib.messages import constants
+from django.contrib.messages.storage.session import SessionStorage
 from django.core.urlresolvers import clear_url_caches
 from django.http import Http404, HttpResponse
+from django.test.client import RequestFactory
+from django.utils.cache import patch_vary_headers
+from django.utils.importlib import import_module
 import sys
 
 
@@ -146,3 +153,79 @@ class ViewTests(SettingsOverrideTestCase):
         PagePermission.objects.create(can_change=True, user=user, page=page)
         response = self.client.get("/en/?edit")
         self.assertContains(response, "'edit_mode': true,", 1, 200)
+
+    def test_page_cache_middleware(self):
+        page = create_page("page", "nav_playground.html", "en", published=True)
+        middleware = (['cms.middleware.cache.UpdatePageCacheMiddleware'] +
+                      list(settings.MIDDLEWARE_CLASSES) +
+                      ['cms.middleware.cache.FetchFromPageCacheMiddleware'])
+        with SettingsOverride(MIDDLEWARE_CLASSES=middleware):
+            # the first response sets the language cookie, it isn't cached
+            response = self.client.get('/en/')
+            self.assertTrue(response.cookies)
+            response = self.client.get('/en/')
+            self.assertContains(response, 'page')
+            with self.assertNumQueries(0):
+                cached_response = self.client.get('/en/')
+            self.assertEqual(cached_response.content, response.content)
+            # publishing a page invalidates the cached responses
+            title = page.get_title_obj('en')
+            title.title = 'changed'
+            title.save()
+            page.publish()
+            response = self.client.get('/en/')
+            self.assertContains(response, 'changed')
+            # logged in users always get a freshly rendered page
+            user = self.get_superuser()
+            self.client.login(username=user.username, password=user.username)
+            self.assertNotContains(response, "'edit_mode'")
+            response = self.client.get('/en/')
+            self.assertContains(response, "'edit_mode': false,", 1, 200)
+
+    def test_page_cache_middleware_private_responses(self):
+        page = create_page("page", "nav_playground.html", "en", published=True)
+        update = UpdatePageCacheMiddleware()
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+        def process_response(response, cookie='', **attrs):
+            request = RequestFactory().get('/en/', HTTP_COOKIE=cookie)
+            request.session = SessionStore()
+            request.LANGUAGE_CODE = 'en'
+            request._cms_update_page_cache = 'en'
+            request._cms_rendered_page = page.publisher_public
+            for name, value in attrs.items():
+                setattr(request, name, value)
+            update.process_response(request, response)
+            return request
+
+        def get_cached(cookie=''):
+            request = RequestFactory().get('/en/', HTTP_COOKIE=cookie)
+            request.LANGUAGE_CODE = 'en'
+            return get_response_cache(request, settings.SITE_ID, 'en')
+
+        # responses setting a session or messages cookie are not cached
+        response = HttpResponse('page')
+        response.set_cookie(settings.SESSION_COOKIE_NAME, 'session')
+        process_response(response)
+        response = HttpResponse('page')
+        response.set_cookie('messages', 'message')
+        process_response(response)
+        self.assertEqual(get_cached(), None)
+        # neither are responses changing the session or showing messages
+        session = SessionStore()
+        session['visited'] = True
+        process_response(HttpResponse('page'), session=session)
+        request = self.get_request('/en/')
+        messages = SessionStorage(request)
+        messages.add(constants.INFO, 'message')
+        list(messages)
+        process_response(HttpResponse('page'), _messages=messages)
+        self.assertEqual(get_cached(), None)
+        # responses varying on the cookies are only served to visitors sending
+        # the same cookies
+        response = HttpResponse('page')
+        patch_vary_headers(response, ('Cookie',))
+        process_response(response, cookie='sessionid=visitor')
+        self.assertEqual(get_cached('sessionid=visitor').content, 'page')
+        self.assertEqual(get_cached(), None)
+        self.assertEqual(get_cached('sessionid=other'), None)
@@ -6,7 +6,9 @@ from cms import constants
 from cms.exceptions import CMSDeprecationWarning
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.test.signals import setting_changed
 from django.utils.translation import ugettext_lazy as _
+import copy
 import os
 import warnings
 
@@ -58,6 +60,7 @@ DEFAULTS = {
     'UNIHANDECODE_DECODERS': ['ja', 'zh', 'kr', 'vn', 'diacritic'],
     'UNIHANDECODE_DEFAULT_DECODER': 'diacritic',
     'MAX_PAGE_PUBLISH_REVERSIONS': 25,
+    'SHARED_MENU_CACHE': False,
 }
 
 
@@ -232,8 +235,31 @@ COMPLEX = {
 }
 
 
+# the values returned by get_cms_setting, until the settings change
+_settings_cache = {}
+
+
 def get_cms_setting(name):
-    if name in COMPLEX:
-        return COMPLEX[name]()
-    else:
-        return getattr(settings, 'CMS_%s' % name, DEFAULTS[name])
+    try:
+        value = _settings_cache[name]
+    except KeyError:
+        if name in COMPLEX:
+            value = COMPLEX[name]()
+        else:
+            value = getattr(settings, 'CMS_%s' % name, DEFAULTS[name])
+        _settings_cache[name] = value
+    # the memoized dicts and lists are shared, callers get their own (shallow)
+    # copy, so they can't change what the next caller gets by adding to it
+    if isinstance(value, (dict, list)):
+        return copy.copy(value)
+    return value
+
+
+def clear_cms_settings_cache(**kwargs):
+    """
+    Forgets the values computed by get_cms_setting. Called whenever a setting
+    is changed through override_settings or SettingsOverride.
+    """
+    _settings_cache.clear()
+
+setting_changed.connect(clear_cms_settings_cache)
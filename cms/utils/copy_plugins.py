@@ -1,23 +1,176 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
+import inspect
+
+
+def _accepts_force_insert(model):
+    spec = inspect.getargspec(model.save)
+    return spec.keywords is not None or 'force_insert' in spec.args
+
+
 def copy_plugins_to(plugin_list, to_placeholder, to_language = None):
     """
     Copies a list of plugins to a placeholder to a language.
+
+    The plugins are loaded with one query per plugin type and their copies
+    are inserted with their tree fields already set, so the plugin tree does
+    not have to make room for every single one of them.
     """
-    ptree = []
+    return copy_plugin_lists([(plugin_list, to_placeholder)], to_language)
+
+
+def copy_plugin_lists(copies, to_language = None):
+    """
+    Like copy_plugins_to, for several lists of plugins at once: copies is a
+    list of (plugin list, target placeholder) pairs. The plugins of all the
+    lists are loaded together.
+    """
+    from cms.models import CMSPlugin
+    from cms.plugin_pool import plugin_pool
+    from cms.plugins.utils import downcast_plugins
+    from django.db.models import Max
+
+    # plugins whose type is not installed anymore can't be copied
+    plugin_pool.discover_plugins()
+    copies = [([plugin for plugin in plugin_list if plugin.plugin_type in plugin_pool.plugins],
+               to_placeholder) for plugin_list, to_placeholder in copies]
+    pks = set(plugin.pk for plugin_list, to_placeholder in copies for plugin in plugin_list)
+    if not pks:
+        return []
+    instances = dict((instance.pk, instance) for instance in
+                     downcast_plugins(CMSPlugin.objects.filter(pk__in=pks)))
+    tree_id = CMSPlugin.objects.aggregate(tree_id=Max('tree_id'))['tree_id'] or 0
+
     plugins_ziplist = []
-    for old_plugin in plugin_list:
-        if to_language:
-            plugin_language = to_language
-        else:
-            plugin_language = old_plugin.language
-        # do the simple copying
-        new_plugin = old_plugin.copy_plugin(to_placeholder, plugin_language, ptree) # note that ptree comes back modified
-        plugins_ziplist.append((new_plugin, old_plugin))
-    # this magic is needed for advanced plugins like Text Plugins that can have
-    # nested plugins and need to update their content based on the new plugins.
-    for new_plugin, old_plugin in plugins_ziplist:
-        new_instance = new_plugin.get_plugin_instance()[0]
-        if new_instance:
-            new_instance.post_copy(old_plugin, plugins_ziplist)
+    force_insert = {}
+    for plugin_list, to_placeholder in copies:
+        list_pks = set(plugin.pk for plugin in plugin_list)
+        children = defaultdict(list)
+        roots = []
+        for plugin in plugin_list:
+            if plugin.parent_id in list_pks:
+                children[plugin.parent_id].append(plugin)
+            else:
+                roots.append(plugin)
+
+        # number the copies depth first, every root starting a new tree
+        ordered = []
+        tree_fields = {}
+        for root in roots:
+            tree_id += 1
+            counter = 1
+            stack = [(root, 0, False)]
+            while stack:
+                plugin, level, closing = stack.pop()
+                if closing:
+                    tree_fields[plugin.pk]['rght'] = counter
+                else:
+                    ordered.append(plugin)
+                    tree_fields[plugin.pk] = {'tree_id': tree_id, 'lft': counter, 'level': level}
+                    stack.append((plugin, level, True))
+                    for child in reversed(children[plugin.pk]):
+                        stack.append((child, level + 1, False))
+                counter += 1
+
+        list_ziplist = []
+        new_pks = {}
+        for old_plugin in ordered:
+            # plugins without a saved instance only get their base copied
+            old_instance = instances.get(old_plugin.pk, old_plugin)
+            model = old_instance.__class__
+            new_instance = model(**dict((field.attname, getattr(old_instance, field.attname))
+                                        for field in model._meta.fields if not field.primary_key))
+            new_instance.placeholder = to_placeholder
+            new_instance.language = to_language or old_plugin.language
+            new_instance.parent_id = new_pks.get(old_plugin.parent_id)
+            for name, value in tree_fields[old_plugin.pk].items():
+                setattr(new_instance, name, value)
+            if model not in force_insert:
+                force_insert[model] = _accepts_force_insert(model)
+            if force_insert[model]:
+                new_instance.save(force_insert=True)
+            else:
+                new_instance.save()
+            new_pks[old_plugin.pk] = new_instance.pk
+            if old_instance is not old_plugin:
+                new_instance.copy_relations(old_instance)
+            list_ziplist.append((new_instance, old_instance))
+        # this magic is needed for advanced plugins like Text Plugins that can have
+        # nested plugins and need to update their content based on the new plugins.
+        for new_plugin, old_plugin in list_ziplist:
+            new_plugin.post_copy(old_plugin, list_ziplist)
+        plugins_ziplist.extend(list_ziplist)
     # returns information about originals and copies
     return plugins_ziplist
+
+
+def _tree_signature(plugin_list):
+    index = dict((plugin.pk, i) for i, plugin in enumerate(plugin_list))
+    return [(plugin.plugin_type, plugin.language, plugin.position, index.get(plugin.parent_id))
+            for plugin in plugin_list]
+
+
+# fields which differ between a plugin and its copy anyway
+_NOT_COPIED_FIELDS = ('placeholder', 'parent', 'tree_id', 'lft', 'rght', 'level',
+                      'creation_date', 'changed_date')
+
+
+def _copied_fields(instance):
+    return [field for field in instance._meta.fields
+            if not field.primary_key and field.name not in _NOT_COPIED_FIELDS]
+
+
+def update_plugins_in(plugin_list, to_placeholder):
+    """
+    Brings the plugins of a placeholder in line with a list of plugins which
+    were copied to it before (like the public placeholder of a page with the
+    draft one).
+
+    Only the plugins whose fields differ from their copy are written. When
+    plugins were added, removed or moved, or when one of them copies its
+    relations itself, the placeholder gets a fresh copy.
+    """
+    from cms.models import CMSPlugin
+    from cms.plugin_pool import plugin_pool
+    from cms.plugins.utils import downcast_plugins
+
+    plugin_pool.discover_plugins()
+    plugin_list = [plugin for plugin in plugin_list
+                   if plugin.plugin_type in plugin_pool.plugins]
+    copied_plugins = to_placeholder.get_plugins_list()
+
+    def copy_all():
+        CMSPlugin.objects.filter(placeholder=to_placeholder).delete()
+        return copy_plugins_to(plugin_list, to_placeholder)
+
+    if _tree_signature(plugin_list) != _tree_signature(copied_plugins):
+        return copy_all()
+    # the related objects of a plugin can't be compared, and they can change
+    # without the plugin being saved
+    for plugin_type in set(plugin.plugin_type for plugin in plugin_list):
+        model = plugin_pool.get_plugin(plugin_type).model
+        if model.copy_relations.__func__ is not CMSPlugin.copy_relations.__func__:
+            return copy_all()
+    pks = [plugin.pk for plugin in plugin_list + copied_plugins]
+    instances = dict((instance.pk, instance) for instance in
+                     downcast_plugins(CMSPlugin.objects.filter(pk__in=pks)))
+    updates = []
+    for plugin, copied_plugin in zip(plugin_list, copied_plugins):
+        instance = instances.get(plugin.pk)
+        copy = instances.get(copied_plugin.pk)
+        if instance is None or copy is None or copy.__class__ is not instance.__class__:
+            return copy_all()
+        # compared by value, timestamps of different servers can't be trusted
+        fields = _copied_fields(instance)
+        if any(getattr(copy, field.attname) != getattr(instance, field.attname)
+               for field in fields):
+            updates.append((copy, instance, fields))
+
+    for copy, instance, fields in updates:
+        for field in fields:
+            setattr(copy, field.attname, getattr(instance, field.attname))
+        copy.save()
+    plugins_ziplist = [(copied_plugin, plugin) for plugin, copied_plugin in zip(plugin_list, copied_plugins)]
+    for copy, instance, fields in updates:
+        copy.post_copy(instance, plugins_ziplist)
+    return [(copy, instance) for copy, instance, fields in updates]
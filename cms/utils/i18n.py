@@ -3,6 +3,7 @@ from contextlib import contextmanager
 
 from django.core.urlresolvers import get_resolver, LocaleRegexURLResolver
 from django.conf import settings
+from django.test.signals import setting_changed
 from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 
@@ -19,34 +20,88 @@ def force_language(new_lang):
     translation.activate(old_lang)
 
 
+# the languages of the sites missing in CMS_LANGUAGES, built from LANGUAGES
+_default_languages = {}
+
+
 def get_languages(site_id=None):
     site_id = get_site(site_id)
-    result = get_cms_setting('LANGUAGES').get(site_id)
+    languages = get_cms_setting('LANGUAGES')
+    result = languages.get(site_id)
     if not result:
-        result = []
-        defaults = get_cms_setting('LANGUAGES').get('default', {})
-        for code, name in settings.LANGUAGES:
-            lang = {'code': code, 'name': _(name)}
-            lang.update(defaults)
-            result.append(lang)
-        get_cms_setting('LANGUAGES')[site_id] = result
+        result = _default_languages.get(site_id)
+        if result is None:
+            result = []
+            defaults = languages.get('default', {})
+            for code, name in settings.LANGUAGES:
+                lang = {'code': code, 'name': _(name)}
+                lang.update(defaults)
+                result.append(lang)
+            _default_languages[site_id] = result
     return result
 
 
+# per site lookup tables of the languages, see _get_language_table
+_language_tables = {}
+
+
+def clear_language_caches(**kwargs):
+    """
+    Forgets the default languages and the lookup tables of the sites. Called
+    whenever a setting is changed through override_settings or
+    SettingsOverride.
+    """
+    _default_languages.clear()
+    _language_tables.clear()
+
+setting_changed.connect(clear_language_caches)
+
+
+def _get_language_table(site_id=None):
+    """
+    Returns the lookup table of the languages of the site, which is built
+    once for every value of the CMS_LANGUAGES setting.
+    """
+    site_id = get_site(site_id)
+    languages = get_languages(site_id)
+    table = _language_tables.get(site_id)
+    if table is None or table['languages'] is not languages:
+        if settings.USE_I18N:
+            codes = [language['code'] for language in languages]
+        else:
+            codes = [settings.LANGUAGE_CODE]
+        # built backwards, so the first of duplicate keys wins
+        indexed_codes = list(enumerate(codes))[::-1]
+        table = {
+            'languages': languages,
+            'codes': codes,
+            'objects': dict((language['code'], language) for language in languages[::-1]),
+            'public': [language['code'] for language in languages if language.get('public', True)],
+            # code -> position in codes
+            'positions': dict((code, index) for index, code in indexed_codes),
+            # base code -> position of the first code with that base code
+            'base_positions': dict((code.split('-')[0], index) for index, code in indexed_codes),
+        }
+        _language_tables[site_id] = table
+    return table
+
+
 def get_language_code(language_code):
     """
     Returns language code while making sure it's in LANGUAGES
     """
     if not language_code:
         return None
-    languages = get_language_list()
-    if language_code in languages: # direct hit
+    table = _get_language_table()
+    positions = table['positions']
+    if language_code in positions: # direct hit
         return language_code
-    for lang in languages:
-        if language_code.split('-')[0] == lang: # base language hit
-            return lang
-        if lang.split('-')[0] == language_code: # base language hit
-            return lang
+    # base language hits, the first one in LANGUAGES wins
+    hits = [position for position in (positions.get(language_code.split('-')[0]),
+                                      table['base_positions'].get(language_code))
+            if position is not None]
+    if hits:
+        return table['codes'][min(hits)]
     return language_code
 
 
@@ -75,12 +130,7 @@ def get_language_list(site_id=None):
     """
     :return: returns a list of iso2codes for this site
     """
-    if not settings.USE_I18N:
-        return [settings.LANGUAGE_CODE]
-    languages = []
-    for language in get_languages(site_id):
-        languages.append(language['code'])
-    return languages
+    return list(_get_language_table(site_id)['codes'])
 
 
 def get_language_tuple(site_id=None):
@@ -107,11 +157,7 @@ def get_public_languages(site_id=None):
     """
     :return: list of iso2codes of public languages for this site
     """
-    languages = []
-    for language in get_language_objects(site_id):
-        if language.get("public", True):
-            languages.append(language['code'])
-    return languages
+    return list(_get_language_table(site_id)['public'])
 
 
 def get_language_object(language_code, site_id=None):
@@ -119,10 +165,10 @@ def get_language_object(language_code, site_id=None):
     :param language_code: RFC5646 language code
     :return: the language object filled up by defaults
     """
-    for language in get_languages(site_id):
-        if language['code'] == get_language_code(language_code):
-            return language
-    raise LanguageError('Language not found: %s' % language_code)
+    try:
+        return _get_language_table(site_id)['objects'][get_language_code(language_code)]
+    except KeyError:
+        raise LanguageError('Language not found: %s' % language_code)
 
 
 def get_language_objects(site_id=None):
@@ -10,8 +10,10 @@ from django.utils.encoding import force_unicode
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _, ungettext_lazy
 
+from cms.cache.pages import get_page_cache, set_page_cache
 from cms.exceptions import NoHomeFound
 from cms.models.pagemodel import Page
+from cms.models.titlemodels import Title
 from cms.utils.urlutils import any_path_re
 
 ADMIN_PAGE_RE_PATTERN = ur'cms/page/(\d+)'
@@ -70,41 +72,57 @@ def get_page_queryset_from_path(path, preview=False, draft=False, site=None):
     else:
         pages = Page.objects.public().published(site)
 
+    # if there is no path (slashes stripped) and we found a home, this is the
+    # home page. A home page also proves there are root pages.
+    if not path:
+        try:
+            return pages.get_home(site=site)
+        except NoHomeFound:
+            pass
+
     # Check if there are any pages
     if not pages.all_root().exists():
         return None
 
-    # get the home page (needed to get the page)
-    try:
-        home = pages.get_home(site=site)
-    except NoHomeFound:
-        home = None
-    # if there is no path (slashes stripped) and we found a home, this is the
-    # home page.
-    if not path and home:
-        page = home
-        return page
-
     # title_set__path=path should be clear, get the pages where the path of the
     # title object is equal to our path.
     return pages.filter(title_set__path=path).distinct()
 
 
+def _prefetch_page(page):
+    """ Fills the title, language and template caches of a resolved page, so
+    a cached copy can be rendered without going back to the database for them.
+    """
+    page.title_cache = {}
+    for title in Title.objects.filter(page=page):
+        title._page_cache = page
+        page.title_cache[title.language] = title
+    page.all_languages = sorted(map(str, page.title_cache))
+    page.get_template()
+
+
 def get_page_from_path(path, preview=False, draft=False):
     """ Resolves a url path to a single page object.
     Raises exceptions is page does not exist or multiple pages are found
+    Resolved pages are cached by path until a page or title gets saved.
     """
+    site_id = settings.SITE_ID
+    page = get_page_cache(site_id, path, preview, draft)
+    if page is not None:
+        return page
     page_qs = get_page_queryset_from_path(path, preview, draft)
-    if page_qs is not None:
-        if isinstance(page_qs, Page):
-            return page_qs
+    if page_qs is None:
+        return None
+    if isinstance(page_qs, Page):
+        page = page_qs
+    else:
         try:
             page = page_qs.get()
         except Page.DoesNotExist:
             return None
-        return page
-    else:
-        return None
+    _prefetch_page(page)
+    set_page_cache(site_id, path, preview, draft, page)
+    return page
 
 
 def get_page_from_request(request, use_path=None):
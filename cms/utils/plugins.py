@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+from cms import constants
 from cms.exceptions import DuplicatePlaceholderWarning
 from cms.models import Page
 from cms.templatetags.cms_tags import Placeholder
+from cms.utils import get_cms_setting
 from cms.utils.placeholder import validate_placeholder_name
+from django.conf import settings
 from django.contrib.sites.models import Site, SITE_CACHE
 from django.shortcuts import get_object_or_404
 from django.template import (NodeList, TextNode, VariableNode, 
@@ -10,6 +13,7 @@ from django.template import (NodeList, TextNode, VariableNode,
 from django.template.loader import get_template
 from django.template.loader_tags import (ConstantIncludeNode, ExtendsNode, 
     BlockNode)
+from django.test.signals import setting_changed
 import warnings
 from sekizai.helpers import is_variable_extend_node
 
@@ -119,7 +123,17 @@ def _scan_placeholders(nodelist, current_block=None, ignore_blocks=None):
                     placeholders += _scan_placeholders(obj, current_block, ignore_blocks)
     return placeholders
 
+# template name -> placeholder names, see get_placeholders
+_template_placeholders = {}
+
 def get_placeholders(template):
+    """
+    Returns the names of the placeholders in the template. The templates are
+    only scanned once per process, unless DEBUG is on so changes to them are
+    picked up.
+    """
+    if template in _template_placeholders and not settings.DEBUG:
+        return list(_template_placeholders[template])
     compiled_template = get_template(template)
     placeholders = _scan_placeholders(compiled_template.nodelist)
     clean_placeholders = []
@@ -129,8 +143,29 @@ def get_placeholders(template):
         else:
             validate_placeholder_name(placeholder)
             clean_placeholders.append(placeholder)
+    _template_placeholders[template] = tuple(clean_placeholders)
     return clean_placeholders
 
+def clear_template_placeholders(**kwargs):
+    """
+    Forgets the placeholders found in the templates. Called whenever a
+    setting is changed through override_settings or SettingsOverride.
+    """
+    _template_placeholders.clear()
+
+setting_changed.connect(clear_template_placeholders)
+
+def warm_template_placeholders():
+    """
+    Scans all templates of CMS_TEMPLATES (but the inheritance one) for their
+    placeholders ahead of the first request, and returns them by template.
+    The placeholders are only kept in the memory of the current process, so
+    this is meant to be called when a worker starts, e.g. in the WSGI module.
+    """
+    return [(template, get_placeholders(template))
+            for template, name in get_cms_setting('TEMPLATES')
+            if template != constants.TEMPLATE_INHERITANCE_MAGIC]
+
 SITE_VAR = "site__exact"
 
 def current_site(request):
@@ -145,4 +145,7 @@ def details(request, slug):
     if not context['has_view_permissions']:
         return _handle_no_page(request, slug)
 
+    # lets cms.middleware.cache.UpdatePageCacheMiddleware know which page got
+    # rendered
+    request._cms_rendered_page = page
     return render_to_response(template_name, context_instance=context)
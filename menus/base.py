@@ -15,9 +15,24 @@ class Menu(object):
         should return a list of NavigationNode instances
         """ 
         raise NotImplementedError
+
+    def orphaned_nodes(self, nodes):
+        """
+        called with the nodes returned by get_nodes which could not be added
+        to the menu tree, because their parent does not exist or because of
+        circular references
+        """
+        pass
     
 class Modifier(object):
-    
+    # The result of the pre-cut modifiers (see MenuPool.get_nodes) is
+    # memoized on the request and reused by all the menu tags of a page, so
+    # a modifier only runs once per request for the same arguments. Modifiers
+    # which must run for every menu tag (e.g. because they depend on something
+    # else than the request and the arguments of modify) set this to False,
+    # which disables the memoization.
+    memoize = True
+
     def modify(self, request, nodes, namespace, root_id,  post_cut, breadcrumb):
         pass
     
@@ -4,70 +4,194 @@ from cms.utils.django_load import load
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.cache import cache
+from django.utils.functional import Promise
 from django.utils.translation import get_language
 from menus.exceptions import NamespaceAllreadyRegistered
-from menus.models import CacheKey
+from collections import deque
+from contextlib import contextmanager
 import copy
+import datetime
+import decimal
+import threading
+import time
 
-def _build_nodes_inner_for_one_menu(nodes, menu_class_name):
+def _build_nodes_inner_for_one_menu(nodes, menu_class_name, orphans_callback=None):
     '''
     This is an easier to test "inner loop" building the menu tree structure
     for one menu (one language, one site) 
+
+    It runs in linear time: a node whose parent was not seen yet waits for it
+    and is added to the tree right after its parent. The nodes which never get
+    a parent (non-existing parent or circular references) are left out of the
+    tree and, if given, passed to orphans_callback.
     '''
-    done_nodes = {} # Dict of node.id:Node
+    done_nodes = {} # Dict of node.namespace:{node.id:Node}
+    waiting_nodes = {} # Dict of (node.namespace, node.parent_id):[Node, ...]
     final_nodes = []
-    
-    # This is to prevent infinite loops - we need to compare the number of 
-    # times we see a specific node to "something", and for the time being, 
-    # it's the total number of nodes
-    list_total_length = len(nodes)
-    
-    while nodes:
-        # For when the node has a parent_id but we haven't seen it yet. 
-        # We must not append it to the final list in this case!
-        should_add_to_final_list = True 
-        
-        node = nodes.pop(0)
-        
-        # Increment the "seen" counter for this specific node.
-        node._counter = getattr(node,'_counter',0) + 1  
-        
+    added = set()
+
+    def add_with_waiting_children(node):
+        queue = deque([node])
+        while queue:
+            node = queue.popleft()
+            final_nodes.append(node)
+            added.add(id(node))
+            # add it to the "seen" list
+            done_nodes[node.namespace][node.id] = node
+            for child in waiting_nodes.pop((node.namespace, node.id), []):
+                attach(child, node)
+                queue.append(child)
+
+    def attach(node, parent):
+        # Implicit parent namespace by menu.__name__
+        if not node.parent_namespace:
+            node.parent_namespace = menu_class_name
+        parent.children.append(node)
+        node.parent = parent
+
+    for node in nodes:
         # Implicit namespacing by menu.__name__
         if not node.namespace:
             node.namespace = menu_class_name
         if node.namespace not in done_nodes:
             # We need to create the namespace dict to avoid KeyErrors
-            done_nodes[node.namespace] = {} 
-        
+            done_nodes[node.namespace] = {}
+
         # If we have seen the parent_id already...
-        if node.parent_id in done_nodes[node.namespace] :
-            # Implicit parent namespace by menu.__name__
-            if not node.parent_namespace:
-                node.parent_namespace = menu_class_name
-            parent = done_nodes[node.namespace][node.parent_id]
-            parent.children.append(node)
-            node.parent = parent
-        # If it has a parent_id but we haven't seen it yet...
+        if node.parent_id in done_nodes[node.namespace]:
+            attach(node, done_nodes[node.namespace][node.parent_id])
+            add_with_waiting_children(node)
+        # If it has a parent_id but we haven't seen it yet, it waits for it.
+        # Never add this node to the final list until it has a real parent
         elif node.parent_id:
-            # We check for infinite loops here, by comparing the number of 
-            # times we "saw" this node to the number of nodes in the list
-            if node._counter < list_total_length:
-                nodes.append(node)
-            # Never add this node to the final list until it has a real 
-            # parent (node.parent)
-            should_add_to_final_list = False
-            
-        if should_add_to_final_list:
-            final_nodes.append(node)
-            # add it to the "seen" list
-            done_nodes[node.namespace][node.id] = node
+            waiting_nodes.setdefault((node.namespace, node.parent_id), []).append(node)
+        else:
+            add_with_waiting_children(node)
+
+    if orphans_callback and waiting_nodes:
+        orphans_callback([node for node in nodes if id(node) not in added])
     return final_nodes
 
+
+def _get_version_key(site_id=None, language=None):
+    '''
+    Cache key of the menu version counter of a site and/or a language (or of
+    all the menus if none given).
+    '''
+    prefix = getattr(settings, "CMS_CACHE_PREFIX", "menu_cache_")
+    key = "%smenu_version" % prefix
+    if site_id:
+        key += "_site_%s" % site_id
+    if language:
+        key += "_lang_%s" % language
+    return key
+
+
+def _new_version():
+    # Time based, so a counter which got evicted from the cache does not
+    # start again with a value it already had.
+    return int(time.time() * 1000)
+
+
+# values of these types are shared by the thawed nodes, everything else is
+# deep copied for each of them
+_IMMUTABLE_TYPES = (basestring, int, long, float, bool, type(None),
+                    datetime.date, datetime.time, datetime.timedelta,
+                    decimal.Decimal, Promise)
+
+
+def _split_mutable(values):
+    '''
+    Splits a dict into the items with an immutable value and the others.
+    '''
+    immutable, mutable = {}, {}
+    for key, value in values.items():
+        if isinstance(value, _IMMUTABLE_TYPES):
+            immutable[key] = value
+        else:
+            mutable[key] = value
+    return immutable, mutable
+
+
+def _get_url_index(nodes):
+    '''
+    Maps the URLs of the nodes to the position of the first node having it.
+    '''
+    url_index = {}
+    for position, node in enumerate(nodes):
+        url_index.setdefault(node.get_absolute_url(), position)
+    return url_index
+
+
+class FrozenNodes(object):
+    '''
+    Compact, read-only representation of a built menu tree, which is what
+    gets cached.
+
+    The tree references of the nodes (parent, children) are replaced by index
+    arrays, so the tree does not need to be deep copied for every request:
+    thaw() creates a fresh set of nodes in one linear pass, which modifiers are
+    free to change. Only the mutable attribute values (and the ones in attr)
+    are deep copied for that.
+
+    With index_urls, the URLs of the nodes are indexed to find the selected
+    node quickly (see MenuPool._mark_selected).
+    '''
+    def __init__(self, nodes, index_urls=False):
+        nodes = list(nodes)
+        self.count = len(nodes)
+        self.url_index = _get_url_index(nodes) if index_urls else None
+        index = dict((id(node), i) for i, node in enumerate(nodes))
+        # Parents which are not part of the list (e.g. removed by a modifier)
+        # are stored too, so the nodes are linked exactly as the given ones.
+        i = 0
+        while i < len(nodes):
+            parent = nodes[i].parent
+            if parent is not None and id(parent) not in index:
+                index[id(parent)] = len(nodes)
+                nodes.append(parent)
+            i += 1
+        self.states = []
+        self.parents = []
+        self.children = []
+        for node in nodes:
+            state = node.__dict__.copy()
+            del state['parent'], state['children']
+            attr = _split_mutable(state.pop('attr'))
+            self.states.append((node.__class__, _split_mutable(state), attr))
+            self.parents.append(index.get(id(node.parent), -1))
+            self.children.append(tuple(index[id(child)] for child in node.children if id(child) in index))
+
+    def thaw(self):
+        '''
+        Returns a new list of NavigationNode instances, linked as the original
+        tree.
+        '''
+        nodes = []
+        for cls, (state, mutable_state), (attr, mutable_attr) in self.states:
+            node = cls.__new__(cls)
+            node.__dict__.update(state)
+            node.attr = attr.copy()
+            if mutable_state:
+                node.__dict__.update(copy.deepcopy(mutable_state))
+            if mutable_attr:
+                node.attr.update(copy.deepcopy(mutable_attr))
+            nodes.append(node)
+        for node, parent, children in zip(nodes, self.parents, self.children):
+            node.parent = nodes[parent] if parent >= 0 else None
+            node.children = [nodes[child] for child in children]
+        return nodes[:self.count]
+
+
 class MenuPool(object):
     def __init__(self):
         self.menus = {}
         self.modifiers = []
         self.discovered = False
+        # bumped by clear() to invalidate the trees memoized on requests
+        self.generation = 0
+        # the invalidations collected by delay_clear(), per thread
+        self._delayed = threading.local()
         
     def discover_menus(self):
         if self.discovered:
@@ -80,14 +204,63 @@ class MenuPool(object):
     def clear(self, site_id=None, language=None, all=False):
         '''
         This invalidates the cache for a given menu (site_id and language)
+
+        The cached menus are not deleted, instead the version counter of the
+        given site and/or language is bumped, which changes the cache keys of
+        the affected menus (see _get_versions).
         '''
         if all:
-            cache_keys = CacheKey.objects.get_keys()
-        else:
-            cache_keys = CacheKey.objects.get_keys(site_id, language)        
-        to_be_deleted = cache_keys.distinct().values_list('key', flat=True)
-        cache.delete_many(to_be_deleted)
-        cache_keys.delete()
+            site_id = language = None
+        delayed = getattr(self._delayed, 'clears', None)
+        if delayed is not None:
+            delayed.add((site_id, language))
+            return
+        self.generation += 1
+        key = _get_version_key(site_id, language)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), get_cms_setting('CACHE_DURATIONS')['menus'])
+
+    @contextmanager
+    def delay_clear(self):
+        '''
+        Collects the invalidations (see clear) made in the block and runs each
+        of them once when the block is left, for bulk operations like
+        publishing many pages. Nested blocks are part of the outermost one.
+        '''
+        if getattr(self._delayed, 'clears', None) is not None:
+            yield
+            return
+        self._delayed.clears = set()
+        try:
+            yield
+        finally:
+            clears, self._delayed.clears = self._delayed.clears, None
+            if (None, None) in clears:
+                clears = [(None, None)]
+            for site_id, language in clears:
+                self.clear(site_id, language)
+
+    def _get_versions(self, site_id, language):
+        '''
+        Returns the version counters a menu of the given site and language
+        depends on: the global one, the site's, the language's and the one of
+        the site and language. Missing counters (never bumped or evicted) are
+        initialized with a new value.
+        '''
+        keys = [
+            _get_version_key(),
+            _get_version_key(site_id=site_id),
+            _get_version_key(language=language),
+            _get_version_key(site_id, language),
+        ]
+        versions = cache.get_many(keys)
+        missing = dict((key, _new_version()) for key in keys if key not in versions)
+        if missing:
+            cache.set_many(missing, get_cms_setting('CACHE_DURATIONS')['menus'])
+            versions.update(missing)
+        return [versions[key] for key in keys]
     
     def register_menu(self, menu):
         from menus.base import Menu
@@ -118,35 +291,45 @@ class MenuPool(object):
             if it's found:
                 set the node as the node's parent's child (re-read this)
             else:
-                the node is put at the bottom of the list
+                the node waits until its parent is found
+        - Nodes whose parent is never found are passed to the menu's
+          orphaned_nodes method
+
+        The tree is cached and returned as a FrozenNodes instance.
         """
         # Cache key management
         lang = get_language()
         prefix = getattr(settings, "CMS_CACHE_PREFIX", "menu_cache_")
         key = "%smenu_nodes_%s_%s" % (prefix, lang, site_id)
-        if request.user.is_authenticated():
+        if get_cms_setting('SHARED_MENU_CACHE'):
+            # One tree for all users, the menu modifiers take care of
+            # removing what the current user is not allowed to see.
+            from cms.utils.page_resolver import use_draft
+            if use_draft(request):
+                key += "_draft"
+        elif request.user.is_authenticated():
             key += "_%s_user" % request.user.pk
+        # the cache is shared between processes, so the menus are
+        # invalidated by bumping version counters stored in the cache too
+        key += "_%s" % "_".join(str(version) for version in self._get_versions(site_id, lang))
         cached_nodes = cache.get(key, None)
-        if cached_nodes:
+        if cached_nodes is not None:
             return cached_nodes
         
         final_nodes = []
         for menu_class_name in self.menus:
             nodes = self.menus[menu_class_name].get_nodes(request)
             # nodes is a list of navigation nodes (page tree in cms + others)
-            final_nodes += _build_nodes_inner_for_one_menu(nodes, menu_class_name)
+            final_nodes += _build_nodes_inner_for_one_menu(
+                nodes, menu_class_name, self.menus[menu_class_name].orphaned_nodes)
+        final_nodes = FrozenNodes(final_nodes, index_urls=True)
         cache.set(key, final_nodes, get_cms_setting('CACHE_DURATIONS')['menus'])
-        # We need to have a list of the cache keys for languages and sites that
-        # span several processes - so we follow the Django way and share through 
-        # the database. It's still cheaper than recomputing every time!
-        # This way we can selectively invalidate per-site and per-language, 
-        # since the cache shared but the keys aren't 
-        CacheKey.objects.get_or_create(key=key, language=lang, site=site_id)
         return final_nodes
 
-    def apply_modifiers(self, nodes, request, namespace=None, root_id=None, post_cut=False, breadcrumb=False):
+    def apply_modifiers(self, nodes, request, namespace=None, root_id=None, post_cut=False, breadcrumb=False,
+                        url_index=None):
         if not post_cut:
-            nodes = self._mark_selected(request, nodes)
+            nodes = self._mark_selected(request, nodes, url_index)
         for cls in self.modifiers:
             inst = cls()
             nodes = inst.modify(request, nodes, namespace, root_id, post_cut, breadcrumb)
@@ -156,28 +339,46 @@ class MenuPool(object):
         self.discover_menus()
         if not site_id:
             site_id = Site.objects.get_current().pk
-        nodes = self._build_nodes(request, site_id)
-        nodes = copy.deepcopy(nodes)
-        nodes = self.apply_modifiers(nodes, request, namespace, root_id, post_cut=False, breadcrumb=breadcrumb)
+        # The modified tree is memoized on the request, so all the menu tags
+        # of a page share the work, unless a modifier opts out (see
+        # Modifier.memoize). Every call gets its own copy of the nodes.
+        memoize = not [cls for cls in self.modifiers if not cls.memoize]
+        key = (site_id, get_language(), namespace, root_id, breadcrumb)
+        if memoize:
+            if getattr(request, '_menu_nodes_generation', None) != self.generation:
+                request._menu_nodes_cache = {}
+                request._menu_nodes_generation = self.generation
+            if key in request._menu_nodes_cache:
+                return request._menu_nodes_cache[key].thaw()
+        frozen_nodes = self._build_nodes(request, site_id)
+        nodes = self.apply_modifiers(frozen_nodes.thaw(), request, namespace, root_id, post_cut=False,
+                                     breadcrumb=breadcrumb, url_index=frozen_nodes.url_index)
+        if memoize:
+            request._menu_nodes_cache[key] = FrozenNodes(nodes)
         return nodes 
 
-    def _mark_selected(self, request, nodes):
-        sel = None
+    def _mark_selected(self, request, nodes, url_index=None):
+        '''
+        Marks the node with the longest URL which is a prefix of the request
+        path as selected.
+
+        url_index maps the URLs to the position of the nodes (see
+        FrozenNodes), so the selected node is found with one lookup per
+        prefix of the path instead of comparing the URL of every node.
+        '''
+        if url_index is None:
+            url_index = _get_url_index(nodes)
         for node in nodes:
             node.sibling = False
             node.ancestor = False
             node.descendant = False
             node.selected = False
-            if node.get_absolute_url() == request.path[:len(node.get_absolute_url())]:
-                if sel:
-                    if len(node.get_absolute_url()) > len(sel.get_absolute_url()):
-                        sel = node
-                else:
-                    sel = node
-            else:
-                node.selected = False
-        if sel:
-            sel.selected = True
+        path = request.path
+        for length in range(len(path), -1, -1):
+            position = url_index.get(path[:length])
+            if position is not None:
+                nodes[position].selected = True
+                break
         return nodes
 
     def get_menus_by_attribute(self, name, value):